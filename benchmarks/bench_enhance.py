@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import httpx
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import ROOT, percentiles, write_results
+from make_corpus import ensure_corpus
+from service.versions import FILES
+
+
+"""
+End-to-end /enhance load test. Starts the service under uvicorn with
+PROVIDER=ollama pointed at an in-process stub LLM (fixed latency, fixed token
+count), so the numbers measure this service and not a model. For each
+--concurrency level it sends --requests requests and reports throughput,
+latency percentiles, errors and the mean per-stage time from /metrics.
+
+The service uses an existing index via --config; without one it builds a
+flat index over a generated corpus into a temp dir first.
+
+  python benchmarks/bench_enhance.py --concurrency 1 8 32 --requests 200 --out benchmarks/results/enhance.json
+"""
+
+
+STAGE_RE = re.compile(r'^enhancer_stage_seconds_(sum|count)\{endpoint="enhance",stage="([a-z_]+)"\} ([0-9.e+-]+)$')
+
+
+
+
+class StubOllama(BaseHTTPRequestHandler):
+	latency_s = 0.05
+	tokens = 40
+
+	def do_POST(self):
+		n = int(self.headers.get("Content-Length", 0))
+		body = json.loads(self.rfile.read(n) or b"{}")
+		time.sleep(self.latency_s)
+		self.send_response(200)
+		self.send_header("Content-Type", "application/x-ndjson")
+		self.end_headers()
+		for i in range(self.tokens):
+			self.wfile.write((json.dumps({"response": f"tok{i} ", "done": False}) + "\n").encode())
+		done = {"response": "", "done": True, "prompt_eval_count": len(body.get("prompt", "")) // 4, "eval_count": self.tokens}
+		self.wfile.write((json.dumps(done) + "\n").encode())
+
+	def log_message(self, *args):
+		pass
+
+
+
+
+def start_stub(latency_ms, tokens):
+	StubOllama.latency_s = latency_ms / 1000.0
+	StubOllama.tokens = tokens
+	server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+
+
+def prepare_config(args, workdir):
+	if args.config:
+		return os.path.abspath(args.config)
+	corpus = ensure_corpus(args.docs, args.seed)
+	outdir = os.path.join(workdir, "index")
+	subprocess.run(
+		[sys.executable, os.path.join(ROOT, "scripts", "build_index.py"), "--input", corpus, "--outdir", outdir,
+		 "--model", args.model, "--config", os.path.join(ROOT, "config.example.toml"), "--index-type", "flat"],
+		cwd=ROOT, check=True,
+	)
+	with open(os.path.join(ROOT, "config.example.toml"), "r", encoding="utf-8") as f:
+		cfg = f.read()
+	# every index file (the same list versioned builds use), so nothing falls back to the repo's index/
+	paths = {"root": outdir, **{key: os.path.join(outdir, name) for key, name in FILES.items()}}
+	for key, value in paths.items():
+		line = f"{key} = {json.dumps(value)}"
+		cfg, n = re.subn(rf"^{key} = .*$", lambda _: line, cfg, count=1, flags=re.M)
+		if not n:
+			cfg = cfg.replace("[index]\n", f"[index]\n{line}\n", 1)
+	cfg = cfg.replace('"sentence-transformers/all-MiniLM-L6-v2"', f'"{args.model}"')
+	path = os.path.join(workdir, "config.toml")
+	with open(path, "w", encoding="utf-8") as f:
+		f.write(cfg)
+	return path
+
+
+
+
+def start_service(config_path, port, stub_port, workers):
+	env = dict(os.environ, PROVIDER="ollama", OLLAMA_BASE_URL=f"http://127.0.0.1:{stub_port}", CONFIG_PATH=config_path)
+	return subprocess.Popen(
+		[sys.executable, "-m", "uvicorn", "service.app:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+		cwd=ROOT, env=env,
+	)
+
+
+
+
+def wait_ready(base, timeout=300):
+	deadline = time.time() + timeout
+	while time.time() < deadline:
+		try:
+			if httpx.get(f"{base}/ready", timeout=2).status_code == 200:
+				return
+		except httpx.HTTPError:
+			pass
+		time.sleep(0.5)
+	raise SystemExit(f"service at {base} not ready after {timeout}s")
+
+
+
+
+def stage_totals(base):
+	totals = {}
+	for line in httpx.get(f"{base}/metrics", timeout=10).text.splitlines():
+		m = STAGE_RE.match(line)
+		if m:
+			totals.setdefault(m.group(2), {})[m.group(1)] = float(m.group(3))
+	return totals
+
+
+
+
+def stage_means(before, after):
+	out = {}
+	for stage, a in after.items():
+		b = before.get(stage, {})
+		count = a.get("count", 0) - b.get("count", 0)
+		if count:
+			out[stage] = 1000.0 * (a.get("sum", 0) - b.get("sum", 0)) / count
+	return out
+
+
+
+
+async def load(base, queries, concurrency, n_requests, use_cache, top_k):
+	sem = asyncio.Semaphore(concurrency)
+	latencies, errors = [], 0
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+	async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+		async def one(i):
+			nonlocal errors
+			body = {"project_key": "APP", "vague_text": queries[i % len(queries)], "top_k": top_k, "use_cache": use_cache}
+			async with sem:
+				t0 = time.perf_counter()
+				try:
+					r = await client.post("/enhance", json=body)
+					ok = r.status_code == 200
+				except httpx.HTTPError:
+					ok = False
+				if ok:
+					latencies.append(1000.0 * (time.perf_counter() - t0))
+				else:
+					errors += 1
+
+		t0 = time.perf_counter()
+		await asyncio.gather(*(one(i) for i in range(n_requests)))
+		wall = time.perf_counter() - t0
+	return {"requests": n_requests, "errors": errors, "wall_s": wall, "rps": len(latencies) / wall, **percentiles(latencies)}
+
+
+
+
+def vague_queries(corpus, n, seed):
+	# first few words of real summaries: short and underspecified, like the tickets being enhanced
+	rng = random.Random(seed)
+	with open(corpus, "r", encoding="utf-8") as f:
+		summaries = [json.loads(line)["summary"] for line, _ in zip(f, range(50000))]
+	return [" ".join(s.split()[:rng.randint(2, 5)]) for s in rng.sample(summaries, min(n, len(summaries)))]
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--config", help="service config with a built index; default: build a temporary one")
+	ap.add_argument("--docs", type=int, default=10000, help="corpus size for the temporary index")
+	ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+	ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+	ap.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+	ap.add_argument("--warmup", type=int, default=20)
+	ap.add_argument("--llm-latency-ms", type=float, default=50.0)
+	ap.add_argument("--llm-tokens", type=int, default=40)
+	ap.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+	ap.add_argument("--port", type=int, default=8765)
+	ap.add_argument("--top-k", type=int, default=5)
+	ap.add_argument("--use-cache", action="store_true", help="let the response cache answer repeats")
+	ap.add_argument("--seed", type=int, default=0)
+	ap.add_argument("--out", help="write results JSON here")
+	args = ap.parse_args()
+
+	stub = start_stub(args.llm_latency_ms, args.llm_tokens)
+	with tempfile.TemporaryDirectory(prefix="bench_enhance_") as workdir:
+		config_path = prepare_config(args, workdir)
+		base = f"http://127.0.0.1:{args.port}"
+		proc = start_service(config_path, args.port, stub.server_address[1], args.workers)
+		try:
+			t0 = time.perf_counter()
+			wait_ready(base)
+			ready_s = time.perf_counter() - t0
+			print(f"service ready in {ready_s:.1f}s")
+			queries = vague_queries(ensure_corpus(args.docs, args.seed), 2000, args.seed)
+			asyncio.run(load(base, queries, 4, args.warmup, args.use_cache, args.top_k))
+
+			levels = []
+			for c in args.concurrency:
+				before = stage_totals(base) if args.workers == 1 else {}
+				r = asyncio.run(load(base, queries, c, args.requests, args.use_cache, args.top_k))
+				# with several workers /metrics only reflects whichever one answered
+				if args.workers == 1:
+					r["stages_mean_ms"] = stage_means(before, stage_totals(base))
+				r["concurrency"] = c
+				print(f"  c={c:<4} {r['rps']:.1f} req/s  p50={r['p50_ms']:.1f}ms p99={r['p99_ms']:.1f}ms errors={r['errors']}")
+				levels.append(r)
+		finally:
+			proc.terminate()
+			proc.wait(timeout=30)
+			stub.shutdown()
+
+	params = {k: v for k, v in vars(args).items() if k != "out"}
+	write_results(args.out, "enhance", params, {"ready_s": ready_s, "levels": levels})
@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import argparse
+import numpy as np
+import faiss
+
+from common import ROOT, percentiles, rss_mb, write_results
+from make_corpus import ensure_corpus
+from service.storage import index_mb
+from scripts.build_index import Embedder, INDEX_TYPES, iter_chunks, count_docs, doc_text, load_index_params, make_index, train_size
+
+
+"""
+Index build and search benchmark, per corpus size and index type:
+
+  build    train / add seconds, RSS growth, serialized index size
+  search   single-query p50/p99 latency, batched QPS and recall@k against exact
+           search, at the configured nprobe / ef_search (or a sweep with --sweep)
+
+Embeddings are computed once per corpus and cached next to it as .npy, so a
+rerun only measures FAISS. --vectors synthetic skips the encoder entirely
+(clustered random unit vectors), which makes 1M-ticket runs practical.
+
+  python benchmarks/bench_index.py --sizes 10000 100000 --out benchmarks/results/index.json
+  python benchmarks/bench_index.py --sizes 1000000 --vectors synthetic --types ivf_flat ivf_pq hnsw
+"""
+
+
+TYPES = INDEX_TYPES
+SWEEP = {"nprobe": [1, 4, 16, 64, 256], "efSearch": [16, 32, 64, 128, 256]}
+
+
+
+
+def slug(s):
+	return re.sub(r"[^A-Za-z0-9]+", "-", s).strip("-")
+
+
+
+
+def model_vectors(corpus, model_name, chunk_size=10000):
+	path = f"{corpus[:-len('.jsonl')]}.{slug(os.path.basename(model_name))}.npy"
+	if os.path.exists(path):
+		return np.load(path, mmap_mode="r")
+	from sentence_transformers import SentenceTransformer
+	embedder = Embedder(SentenceTransformer(model_name))
+	n = count_docs(corpus)
+	out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.float32, shape=(n, embedder.dim))
+	pos = 0
+	t0 = time.perf_counter()
+	for recs in iter_chunks(corpus, chunk_size):
+		out[pos:pos + len(recs)] = embedder.encode([doc_text(r) for r in recs])
+		pos += len(recs)
+		print(f"  encoded {pos}/{n} ({pos / (time.perf_counter() - t0):.0f} docs/s)")
+	out.flush()
+	del out
+	os.replace(path + ".tmp", path)
+	return np.load(path, mmap_mode="r")
+
+
+
+
+def synthetic_vectors(n, dim=384, clusters=256, seed=0, block=100000):
+	data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+	path = os.path.join(data_dir, f"synthetic_{n}_d{dim}_s{seed}.npy")
+	if os.path.exists(path):
+		return np.load(path, mmap_mode="r")
+	os.makedirs(data_dir, exist_ok=True)
+	rng = np.random.default_rng(seed)
+	centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+	out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.float32, shape=(n, dim))
+	for start in range(0, n, block):
+		m = min(block, n - start)
+		x = centers[rng.integers(clusters, size=m)] + 0.6 * rng.standard_normal((m, dim)).astype(np.float32)
+		out[start:start + m] = x / np.linalg.norm(x, axis=1, keepdims=True)
+	out.flush()
+	del out
+	os.replace(path + ".tmp", path)
+	return np.load(path, mmap_mode="r")
+
+
+
+
+def make_queries(embs, n, seed=1, noise=0.05):
+	# perturbed copies of indexed vectors: near, but not exactly on, a stored point
+	rng = np.random.default_rng(seed)
+	q = np.asarray(embs[np.sort(rng.choice(len(embs), size=min(n, len(embs)), replace=False))], dtype=np.float32)
+	q = q + noise * rng.standard_normal(q.shape).astype(np.float32) / np.sqrt(q.shape[1])
+	return np.ascontiguousarray(q / np.linalg.norm(q, axis=1, keepdims=True))
+
+
+
+
+def exact_truth(embs, queries, k, block=200000):
+	# blockwise exact top-k, so the ground truth never needs a second full copy of the vectors
+	best_d = np.full((len(queries), k), -np.inf, dtype=np.float32)
+	best_i = np.full((len(queries), k), -1, dtype=np.int64)
+	for start in range(0, len(embs), block):
+		flat = faiss.IndexFlatIP(embs.shape[1])
+		flat.add(np.ascontiguousarray(embs[start:start + block]))
+		D, I = flat.search(queries, k)
+		D = np.concatenate([best_d, D], axis=1)
+		I = np.concatenate([best_i, I + start], axis=1)
+		top = np.argsort(-D, axis=1, kind="stable")[:, :k]
+		best_d, best_i = np.take_along_axis(D, top, 1), np.take_along_axis(I, top, 1)
+	return best_i
+
+
+
+
+def build(params, embs, block=100000):
+	n = len(embs)
+	rss0 = rss_mb()
+	t0 = time.perf_counter()
+	need = train_size(params, n)
+	index = make_index(params, embs[:need] if need else embs[:1])
+	t_train = time.perf_counter() - t0
+	for start in range(0, n, block):
+		end = min(start + block, n)
+		index.add_with_ids(np.ascontiguousarray(embs[start:end]), np.arange(start, end, dtype=np.int64))
+	t_total = time.perf_counter() - t0
+	return index, {
+		"train_s": t_train,
+		"add_s": t_total - t_train,
+		"build_s": t_total,
+		"docs_per_s": n / t_total if t_total else None,
+		"rss_delta_mb": rss_mb() - rss0,
+		"index_mb": index_mb(index),
+	}
+
+
+
+
+def settings(index, params, sweep):
+	ivf = faiss.try_extract_index_ivf(index)
+	base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+	if ivf is not None:
+		values = [v for v in SWEEP["nprobe"] if v <= ivf.nlist] if sweep else [min(int(params.get("nprobe", 16)), ivf.nlist)]
+		return "nprobe", values
+	if isinstance(base, faiss.IndexHNSW):
+		return "efSearch", SWEEP["efSearch"] if sweep else [int(params.get("ef_search", 64))]
+	return None, [None]
+
+
+
+
+def measure_search(index, queries, truth, k, latency_queries):
+	single = []
+	for q in queries[:latency_queries]:
+		t0 = time.perf_counter()
+		index.search(q[None, :], k)
+		single.append(1000.0 * (time.perf_counter() - t0))
+	t0 = time.perf_counter()
+	_, I = index.search(queries, k)
+	batch_s = time.perf_counter() - t0
+	hits = sum(len(set(a[a >= 0]) & set(b[b >= 0])) for a, b in zip(I, truth))
+	return {**percentiles(single), "qps_batched": len(queries) / batch_s, "recall": hits / float(truth.size)}
+
+
+
+
+def run(embs, types, base_params, k, n_queries, latency_queries, sweep):
+	queries = make_queries(embs, n_queries)
+	t0 = time.perf_counter()
+	truth = exact_truth(embs, queries, k)
+	print(f"  ground truth for {len(queries)} queries in {time.perf_counter() - t0:.1f}s")
+	out = []
+	for kind in types:
+		params = {**base_params, "type": kind}
+		try:
+			index, stats = build(params, embs)
+		except SystemExit as e:
+			print(f"  {kind:<9} skipped: {e}")
+			out.append({"type": kind, "skipped": str(e)})
+			continue
+		print(f"  {kind:<9} built in {stats['build_s']:.1f}s, {stats['index_mb']:.0f} MB")
+		name, values = settings(index, params, sweep)
+		rows = []
+		ps = faiss.ParameterSpace()
+		for v in values:
+			if name is not None:
+				ps.set_index_parameter(index, name, v)
+			r = {"setting": f"{name}={v}" if name else "exact", **measure_search(index, queries, truth, k, latency_queries)}
+			print(f"    {r['setting']:<13} p50={r['p50_ms']:.3f}ms p99={r['p99_ms']:.3f}ms qps={r['qps_batched']:.0f} recall@{k}={r['recall']:.4f}")
+			rows.append(r)
+		out.append({"type": kind, "params": {k2: v2 for k2, v2 in params.items() if not isinstance(v2, dict)}, "build": stats, "search": rows})
+		del index
+	return out
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+	ap.add_argument("--corpus", help="benchmark this JSONL file instead of generated corpora")
+	ap.add_argument("--types", nargs="+", choices=TYPES, default=TYPES)
+	ap.add_argument("--vectors", choices=["model", "synthetic"], default="model")
+	ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+	ap.add_argument("--config", default=os.path.join(ROOT, "config.example.toml"), help="[index] parameters (nlist, pq_m, hnsw_m, ...)")
+	ap.add_argument("--k", type=int, default=10)
+	ap.add_argument("--queries", type=int, default=1000)
+	ap.add_argument("--latency-queries", type=int, default=500, help="queries timed one at a time for p50/p99")
+	ap.add_argument("--sweep", action="store_true", help="measure every nprobe / efSearch value, not just the configured one")
+	ap.add_argument("--threads", type=int, help="FAISS OpenMP threads")
+	ap.add_argument("--seed", type=int, default=0)
+	ap.add_argument("--out", help="write results JSON here")
+	args = ap.parse_args()
+
+	if args.threads:
+		faiss.omp_set_num_threads(args.threads)
+	base_params = load_index_params(args.config)
+	corpora = [args.corpus] if args.corpus else [ensure_corpus(n, args.seed) for n in args.sizes]
+
+	results = []
+	for corpus in corpora:
+		n = count_docs(corpus)
+		print(f"\n{n} docs ({corpus}), {args.vectors} vectors")
+		t0 = time.perf_counter()
+		embs = synthetic_vectors(n, seed=args.seed) if args.vectors == "synthetic" else model_vectors(corpus, args.model)
+		print(f"  vectors ready in {time.perf_counter() - t0:.1f}s, dim {embs.shape[1]}")
+		results.append({"docs": n, "corpus": os.path.relpath(corpus, ROOT), "dim": int(embs.shape[1]), "indexes": run(
+			embs, args.types, base_params, args.k, args.queries, args.latency_queries, args.sweep
+		)})
+
+	write_results(args.out, "index", {k: v for k, v in vars(args).items() if k != "out"}, results)
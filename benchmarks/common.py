@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+
+
+def percentiles(samples_ms):
+	a = np.asarray(samples_ms, dtype=np.float64)
+	if not len(a):
+		return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "mean_ms": None}
+	p50, p90, p99 = np.percentile(a, [50, 90, 99])
+	return {"p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99), "mean_ms": float(a.mean())}
+
+
+
+
+def rss_mb():
+	# current resident set size; falls back to the peak where /proc is unavailable
+	try:
+		with open("/proc/self/status", "r") as f:
+			for line in f:
+				if line.startswith("VmRSS:"):
+					return int(line.split()[1]) / 1024.0
+	except OSError:
+		pass
+	import resource
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+
+
+def git_commit():
+	try:
+		out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10)
+		dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True, timeout=30)
+		return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+	except Exception:
+		return None
+
+
+
+
+def environment():
+	info = {
+		"commit": git_commit(),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cpus": os.cpu_count(),
+		"numpy": np.__version__,
+	}
+	try:
+		import faiss
+		info["faiss"] = faiss.__version__
+		info["faiss_threads"] = faiss.omp_get_max_threads()
+	except Exception:
+		pass
+	return info
+
+
+
+
+def write_results(path, benchmark, params, results):
+	"""One JSON document per run: what ran, where, on which commit, and the numbers."""
+	doc = {
+		"benchmark": benchmark,
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+		"environment": environment(),
+		"params": params,
+		"results": results,
+	}
+	if path:
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump(doc, f, indent=2)
+		print(f"Results written to {path}")
+	return doc
@@ -0,0 +1,107 @@
+import os
+import json
+import argparse
+import numpy as np
+
+
+"""
+Synthetic tickets in the data/dummy_bugs.jsonl schema (summary, description,
+platform) plus key / project / priority, so every build path can use them.
+Generated from a fixed seed: the same --size and --seed always give the same file.
+
+  python benchmarks/make_corpus.py --size 100000 --out benchmarks/data/corpus_100k.jsonl
+"""
+
+
+PROJECTS = ["APP", "MKT", "OPS", "PAY", "WEB"]
+PLATFORMS = ["Linux", "Windows Server 2019", "Web", "iOS", "Android", "macOS", "Kubernetes"]
+PRIORITIES = ["Highest", "High", "Medium", "Low", "Lowest"]
+PRIORITY_P = [0.05, 0.2, 0.45, 0.2, 0.1]
+COMPONENTS = [
+	"order book", "market data feed", "login service", "payment gateway", "report exporter", "risk engine",
+	"price normalizer", "websocket bridge", "kafka consumer", "settlement batch", "user profile page",
+	"notification worker", "search API", "cache layer", "FIX gateway", "audit log", "mobile checkout",
+]
+SYMPTOMS = [
+	"is delayed", "drops messages", "returns HTTP 500", "leaks memory", "times out", "shows stale data",
+	"crashes on startup", "uses 100% CPU", "rejects valid input", "double-counts records", "hangs under load",
+	"loses the session", "renders blank", "logs a NullPointerException", "misses fields intermittently",
+]
+TRIGGERS = [
+	"during peak trading hours", "after the last deploy", "when the upstream reconnects", "for large payloads",
+	"on the first request after idle", "only in the EU region", "when two users edit at once", "after a failover",
+	"with non-ASCII symbols", "on month-end runs", "behind the corporate proxy", "when the cache is cold",
+]
+DETAILS = [
+	"Logs indicate buffering issues in the consumer.", "Stack trace points at the deserializer.",
+	"Retrying the request succeeds.", "Metrics show queue depth growing steadily.",
+	"Reproducible in staging with production data.", "Only affects about 2% of requests.",
+	"Started after upgrading the client library.", "Restarting the pod clears it for a few hours.",
+	"Error code ERR-{code} is returned to the caller.", "Latency p99 goes above {ms} ms.",
+]
+
+
+
+
+def make_ticket(rng, i):
+	comp = COMPONENTS[rng.integers(len(COMPONENTS))]
+	symptom = SYMPTOMS[rng.integers(len(SYMPTOMS))]
+	trigger = TRIGGERS[rng.integers(len(TRIGGERS))]
+	details = [DETAILS[j] for j in rng.choice(len(DETAILS), size=rng.integers(1, 4), replace=False)]
+	details = [d.format(code=int(rng.integers(1000, 9999)), ms=int(rng.integers(200, 5000))) for d in details]
+	project = PROJECTS[rng.integers(len(PROJECTS))]
+	return {
+		"key": f"{project}-{i + 1}",
+		"project": project,
+		"summary": f"{comp[0].upper() + comp[1:]} {symptom} {trigger}",
+		"description": f"The {comp} {symptom} {trigger}. " + " ".join(details),
+		"platform": PLATFORMS[rng.integers(len(PLATFORMS))],
+		"priority": PRIORITIES[rng.choice(len(PRIORITIES), p=PRIORITY_P)],
+	}
+
+
+
+
+def write_corpus(path, size, seed=0):
+	rng = np.random.default_rng(seed)
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	tmp = path + ".tmp"
+	with open(tmp, "w", encoding="utf-8") as f:
+		for i in range(size):
+			f.write(json.dumps(make_ticket(rng, i), ensure_ascii=False) + "\n")
+	os.replace(tmp, path)
+	return path
+
+
+
+
+def corpus_path(size, seed=0, data_dir=None):
+	data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+	return os.path.join(data_dir, f"corpus_{size}_s{seed}.jsonl")
+
+
+
+
+def ensure_corpus(size, seed=0, data_dir=None):
+	path = corpus_path(size, seed, data_dir)
+	if not os.path.exists(path):
+		print(f"Generating {size} synthetic tickets -> {path}")
+		write_corpus(path, size, seed)
+	return path
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--size", type=int, nargs="+", default=[10000, 100000, 1000000])
+	ap.add_argument("--seed", type=int, default=0)
+	ap.add_argument("--out", help="output path (single --size only); default benchmarks/data/corpus_<size>_s<seed>.jsonl")
+	args = ap.parse_args()
+
+	if args.out and len(args.size) == 1:
+		write_corpus(args.out, args.size[0], args.seed)
+		print(f"Wrote {args.size[0]} tickets to {args.out}")
+	else:
+		for n in args.size:
+			ensure_corpus(n, args.seed)
@@ -1,9 +1,21 @@
 import os
+import sys
 import json
+import time
+import hashlib
+import shutil
 import argparse
+import tomli
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service.metastore import MetaStore, StoreWriter, append_store, doc_id
+from service.bm25 import BM25Index
+from service.shards import build_shards
+from service.duplicates import duplicate_settings, find_duplicates, save_duplicates
+from service.storage import emb_dtype, file_mb, index_mb
+from service.versions import new_version, version_dir, current_version, set_current, prune_versions
 
 
 
@@ -17,30 +29,491 @@ def iter_jsonl(path):
 
 
 
+def iter_chunks(path, size):
+	buf = []
+	for rec in iter_jsonl(path):
+		buf.append(rec)
+		if len(buf) == size:
+			yield buf
+			buf = []
+	if buf:
+		yield buf
+
+
+
+
+def count_docs(path):
+	with open(path, "r", encoding="utf-8") as f:
+		return sum(1 for line in f if line.strip())
+
+
+
+
+def doc_text(rec):
+	return f"{rec.get('summary','')}\n\n{rec.get('description','')}"
+
+
+
+
+def content_hash(text):
+	return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+
+
+def to_meta(rec, text):
+	key = rec.get("key") or ""
+	return {
+		"key": rec.get("key"), "summary": rec.get("summary"), "description": rec.get("description"),
+		"project": rec.get("project") or (key.split("-", 1)[0] if "-" in key else None),
+		"components": rec.get("components") or [], "priority": rec.get("priority"), "hash": content_hash(text),
+	}
+
+
+
+
+class Embedder:
+	"""
+	Encodes one chunk at a time. Texts are sorted by length first so batches (and
+	each worker's share of a chunk) hold similar lengths and waste little padding.
+	With workers > 1 the chunk is spread over a sentence-transformers process pool.
+	"""
+
+	def __init__(self, model, workers=1, batch_size=64):
+		self.model = model
+		self.batch_size = batch_size
+		self.dim = model.get_sentence_embedding_dimension()
+		self.pool = model.start_multi_process_pool(["cpu"] * workers) if workers > 1 else None
+
+	def encode(self, texts):
+		if not texts:
+			return np.empty((0, self.dim), dtype=np.float32)
+		order = np.argsort([len(t) for t in texts], kind="stable")
+		ordered = [texts[i] for i in order]
+		if self.pool is not None:
+			embs = self.model.encode_multi_process(ordered, self.pool, batch_size=self.batch_size)
+		else:
+			embs = self.model.encode(ordered, convert_to_numpy=True, show_progress_bar=False, batch_size=self.batch_size)
+		embs = np.asarray(embs, dtype=np.float32)
+		embs /= np.clip(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12, None)
+		out = np.empty_like(embs)
+		out[order] = embs
+		return out
+
+	def close(self):
+		if self.pool is not None:
+			self.model.stop_multi_process_pool(self.pool)
+			self.pool = None
+
+
+
+
+INDEX_TYPES = ["flat", "sq_fp16", "sq8", "ivf_flat", "ivf_sq8", "ivf_pq", "hnsw"]
+
+
+
+
+def load_config(config_path):
+	# builds work without a config file: every section falls back to its defaults
+	if config_path and os.path.exists(config_path):
+		with open(config_path, "rb") as f:
+			return tomli.load(f)
+	return {}
+
+
+
+
+def load_index_params(config_path, index_type=None, emb_dtype_name=None):
+	params = dict(load_config(config_path).get("index", {}))
+	if index_type:
+		params["type"] = index_type
+	if emb_dtype_name:
+		params["emb_dtype"] = emb_dtype_name
+	params.setdefault("type", "flat")
+	return params
+
+
+
+
+def train_size(params, n):
+	# vectors to collect before creating the index; IVF and SQ8 need training data
+	if params["type"] in ("ivf_flat", "ivf_sq8", "ivf_pq", "sq8"):
+		return min(n, int(params.get("train_size", 100000)))
+	return 0
+
+
+
+
+def make_index(params, embs):
+	"""
+	Index types (all inner product over normalized vectors, so scores are cosine):
+	  flat     - exact brute force, float32 vectors
+	  sq_fp16  - brute force over float16 vectors (half of flat's memory)
+	  sq8      - brute force over 8-bit scalar-quantized vectors (a quarter)
+	  ivf_flat - inverted lists over nlist k-means cells, nprobe cells scanned per query
+	  ivf_sq8  - IVF with 8-bit scalar-quantized vectors
+	  ivf_pq   - IVF with product-quantized codes (pq_m sub-vectors x pq_nbits)
+	  hnsw     - graph index with hnsw_m links per node
+	"""
+	n, dim = embs.shape
+	kind = params["type"]
+	if kind == "flat":
+		return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+	if kind in ("sq_fp16", "sq8"):
+		qtype = faiss.ScalarQuantizer.QT_fp16 if kind == "sq_fp16" else faiss.ScalarQuantizer.QT_8bit
+		base = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+		# sq8 learns each dimension's range from the training vectors; fp16 needs nothing
+		base.train(np.ascontiguousarray(embs, dtype=np.float32))
+		return faiss.IndexIDMap2(base)
+	if kind == "hnsw":
+		base = faiss.IndexHNSWFlat(dim, int(params.get("hnsw_m", 32)), faiss.METRIC_INNER_PRODUCT)
+		base.hnsw.efConstruction = int(params.get("ef_construction", 200))
+		base.hnsw.efSearch = int(params.get("ef_search", 64))
+		return faiss.IndexIDMap2(base)
+	if kind not in ("ivf_flat", "ivf_sq8", "ivf_pq"):
+		raise SystemExit(f"Unknown index type: {kind}")
+
+	# k-means wants ~39 training points per cell; shrink nlist for small corpora
+	nlist = max(1, min(int(params.get("nlist", 1024)), n // 39))
+	quantizer = faiss.IndexFlatIP(dim)
+	if kind == "ivf_flat":
+		index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+	elif kind == "ivf_sq8":
+		index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+	else:
+		pq_m, pq_nbits = int(params.get("pq_m", 16)), int(params.get("pq_nbits", 8))
+		if dim % pq_m:
+			raise SystemExit(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+		if n < 2 ** pq_nbits:
+			raise SystemExit(f"ivf_pq with pq_nbits={pq_nbits} needs at least {2 ** pq_nbits} documents to train; use flat or ivf_flat")
+		index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits, faiss.METRIC_INNER_PRODUCT)
+	index.train(np.ascontiguousarray(embs, dtype=np.float32))
+	index.nprobe = min(int(params.get("nprobe", 16)), nlist)
+	return index
+
+
+
+
+def load_existing(outdir):
+	index = faiss.read_index(os.path.join(outdir, "faiss_index.bin"))
+	meta_path = os.path.join(outdir, "meta.jsonl")
+	if not isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)) or not MetaStore.exists(meta_path):
+		raise SystemExit("Existing index is not ID-mapped; run a full build once before using --incremental.")
+	embs = np.load(os.path.join(outdir, "embeddings.npy"), mmap_mode="r")
+	return index, embs, MetaStore(meta_path)
+
+
+
+
+def append_rows(path, old, new, block=65536):
+	# copy into a new memory-mapped .npy block by block instead of loading the old rows
+	out = np.lib.format.open_memmap(path, mode="w+", dtype=old.dtype, shape=(len(old) + len(new), new.shape[1]))
+	for start in range(0, len(old), block):
+		end = min(start + block, len(old))
+		out[start:end] = old[start:end]
+	out[len(old):] = new
+	out.flush()
+	del out
+
+
+
+
+def commit(outdir, index, emb_tmp=None, meta=None):
+	# vectors first, metadata last: the offset file swap is what makes new records visible
+	faiss.write_index(index, os.path.join(outdir, "faiss_index.bin.tmp"))
+	os.replace(os.path.join(outdir, "faiss_index.bin.tmp"), os.path.join(outdir, "faiss_index.bin"))
+	if emb_tmp is not None:
+		os.replace(emb_tmp, os.path.join(outdir, "embeddings.npy"))
+	if meta is not None:
+		meta()
+
+
+
+
+def build_full(embedder, path, params, outdir, chunk_size=10000):
+	"""
+	Stream the input in chunks: each chunk is encoded, written into a memory-mapped
+	embeddings.npy, appended to the meta store and added to the FAISS index, so
+	only one chunk of texts and vectors is held in memory at a time. IVF indexes
+	are trained once the first `train_size` vectors have been written.
+	"""
+	n = count_docs(path)
+	emb_tmp = os.path.join(outdir, "embeddings.npy.tmp")
+	embs = np.lib.format.open_memmap(emb_tmp, mode="w+", dtype=emb_dtype(params), shape=(n, embedder.dim))
+	writer = StoreWriter(os.path.join(outdir, "meta.jsonl"))
+	need = train_size(params, n)
+
+	index, pos = None, 0
+	for recs in iter_chunks(path, chunk_size):
+		texts = [doc_text(r) for r in recs]
+		chunk = embedder.encode(texts)
+		# vector ids are row numbers in embeddings.npy / line numbers in meta.jsonl
+		ids = np.arange(pos, pos + len(recs), dtype=np.int64)
+		embs[pos:pos + len(recs)] = chunk
+		writer.write(to_meta(r, t) for r, t in zip(recs, texts))
+		pos += len(recs)
+		if index is not None:
+			index.add_with_ids(chunk, ids)
+		elif pos >= need:
+			index = make_index(params, embs[:pos])
+			index.add_with_ids(np.ascontiguousarray(embs[:pos], dtype=np.float32), np.arange(pos, dtype=np.int64))
+		print(f"  {pos}/{n} encoded")
+	if index is None:
+		index = make_index(params, embs[:pos])
+	embs.flush()
+	del embs
+
+	commit(outdir, index, emb_tmp=emb_tmp, meta=writer.close)
+	return index, np.arange(pos, dtype=np.int64)
+
+
+
+
+def build_incremental(embedder, path, outdir, chunk_size=10000):
+	"""
+	Re-embed only new or changed tickets. Changed tickets get a fresh id appended at
+	the end and their old vector is removed from the index; the old meta line stays
+	(the store is append-only) but is never returned by a search.
+	"""
+	index, embs, store = load_existing(outdir)
+	n_old = len(store)
+	# later lines win, so this maps every key (or content hash, for keyless tickets) to its live id
+	by_key = {doc_id(m) or i: (i, m.get("hash")) for i, m in enumerate(store)}
+	store.close()
+
+	texts, new_metas, stale = [], [], []
+	for rec in iter_jsonl(path):
+		text = doc_text(rec)
+		meta = to_meta(rec, text)
+		key = doc_id(meta)
+		prev = by_key.get(key)
+		if prev is not None and prev[1] == meta["hash"]:
+			continue
+		if prev is not None and prev[0] >= n_old:
+			# same key seen earlier in this input: keep the latest version
+			pos = prev[0] - n_old
+			texts[pos], new_metas[pos] = text, meta
+			by_key[key] = (prev[0], meta["hash"])
+			continue
+		if prev is not None:
+			stale.append(prev[0])
+		by_key[key] = (n_old + len(new_metas), meta["hash"])
+		texts.append(text)
+		new_metas.append(meta)
+
+	if stale:
+		if isinstance(index, faiss.IndexIDMap2) and isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW):
+			raise SystemExit("HNSW indexes cannot delete updated vectors; run a full build instead of --incremental.")
+		index.remove_ids(np.asarray(stale, dtype=np.int64))
+	emb_tmp = None
+	if texts:
+		new_embs = np.concatenate([embedder.encode(texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)])
+		index.add_with_ids(new_embs, np.arange(n_old, n_old + len(new_metas), dtype=np.int64))
+		emb_tmp = os.path.join(outdir, "embeddings.npy.tmp")
+		append_rows(emb_tmp, embs, new_embs)
+	del embs
+	print(f"Incremental: {len(texts) - len(stale)} new, {len(stale)} updated, {index.ntotal} live vectors.")
+
+	commit(outdir, index, emb_tmp=emb_tmp, meta=lambda: append_store(os.path.join(outdir, "meta.jsonl"), new_metas))
+	return index, np.asarray(sorted(i for i, _ in by_key.values()), dtype=np.int64)
+
+
+
+
+def build_bm25(outdir, live):
+	# rebuilt from the meta store on every run: tokenizing is cheap next to embedding
+	store = MetaStore(os.path.join(outdir, "meta.jsonl"))
+	bm25 = BM25Index.build((int(i), doc_text(store.raw(int(i)))) for i in live)
+	store.close()
+	bm25.save(os.path.join(outdir, "bm25"))
+	print(f"BM25: {len(bm25.vocab)} terms over {bm25.n_docs} documents.")
+
+
+
+
+def build_project_shards(outdir, live, params, by):
+	"""Per-project (or project/component) shards over the vectors already in embeddings.npy."""
+	kind = params.get("shard_type", "flat")
+
+	def make(vecs):
+		# ANN only pays off (and IVF-PQ only trains) on larger shards; SQ types work at any size
+		small = kind if kind in ("sq_fp16", "sq8") else "flat"
+		return make_index({**params, "type": kind if len(vecs) >= 10000 else small}, vecs)
+
+	embs = np.load(os.path.join(outdir, "embeddings.npy"), mmap_mode="r")
+	store = MetaStore(os.path.join(outdir, "meta.jsonl"))
+	manifest = build_shards(os.path.join(outdir, "shards"), embs, ((int(i), store.raw(int(i))) for i in live), by, make)
+	store.close()
+	sizes = sorted((v["count"] for v in manifest["shards"].values()), reverse=True)
+	print(f"Shards: {len(sizes)} by {by}, largest {sizes[:5]}.")
+
+
+
+
+def build_duplicates(outdir, live, settings):
+	"""Near-duplicate clusters over the live vectors, written to duplicates.json."""
+	embs = np.load(os.path.join(outdir, "embeddings.npy"), mmap_mode="r")
+	store = MetaStore(os.path.join(outdir, "meta.jsonl"))
+	keys = [doc_id(store.raw(int(i))) for i in live]
+	store.close()
+	t0 = time.perf_counter()
+
+	def progress(done, total):
+		print(f"  compared {done}/{total} rows ({time.perf_counter() - t0:.0f}s)")
+
+	payload = find_duplicates(embs, live, keys, progress=progress, **settings)
+	save_duplicates(os.path.join(outdir, "duplicates.json"), payload)
+	sizes = [len(c) for c in payload["clusters"]]
+	print(
+		f"Duplicates: {payload['pairs']} pairs >= {settings['threshold']}, {len(sizes)} clusters "
+		f"covering {sum(sizes)} docs, largest {sizes[:5]} ({time.perf_counter() - t0:.1f}s)."
+	)
+	return payload
+
+
+
+
+def recall_report(index, embs, live, k=10, n_queries=200, seed=0, emb_path=None, params=None):
+	"""
+	Recall@k and per-query latency of `index` against exact flat search, using a
+	sample of indexed documents as queries, across a sweep of nprobe / efSearch.
+	Then the memory footprint of the built index and embeddings.npy next to
+	flat, sq_fp16 and sq8 indexes over the same vectors, with their recall.
+	"""
+	exact = faiss.IndexIDMap2(faiss.IndexFlatIP(embs.shape[1]))
+	exact.add_with_ids(np.ascontiguousarray(embs[live], dtype=np.float32), live)
+	rng = np.random.default_rng(seed)
+	queries = np.ascontiguousarray(embs[rng.choice(live, size=min(n_queries, len(live)), replace=False)], dtype=np.float32)
+	k = min(k, len(live))
+
+	def timed(idx):
+		t0 = time.perf_counter()
+		_, I = idx.search(queries, k)
+		return I, 1000.0 * (time.perf_counter() - t0) / len(queries)
+
+	truth, flat_ms = timed(exact)
+	rows = [{"setting": "flat", "recall": 1.0, "ms_per_query": flat_ms}]
+
+	ivf = faiss.try_extract_index_ivf(index)
+	if ivf is not None:
+		name, values = "nprobe", [v for v in (1, 2, 4, 8, 16, 32, 64, 128, 256) if v <= ivf.nlist]
+	elif isinstance(index, faiss.IndexIDMap2) and isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW):
+		name, values = "efSearch", [16, 32, 64, 128, 256]
+	else:
+		name, values = None, []
+	ps = faiss.ParameterSpace()
+	for v in values:
+		ps.set_index_parameter(index, name, v)
+		I, ms = timed(index)
+		hits = sum(len(set(a[a >= 0]) & set(b[b >= 0])) for a, b in zip(I, truth))
+		rows.append({"setting": f"{name}={v}", "recall": hits / float(truth.size), "ms_per_query": ms})
+
+	print(f"\nRecall@{k} vs flat ({len(queries)} queries, {len(live)} docs):")
+	for r in rows:
+		print(f"  {r['setting']:<14} recall={r['recall']:.4f}  {r['ms_per_query']:.3f} ms/query")
+
+	def recall(idx):
+		I, ms = timed(idx)
+		return sum(len(set(a[a >= 0]) & set(b[b >= 0])) for a, b in zip(I, truth)) / float(truth.size), ms
+
+	# the built index at the nprobe / ef_search the service will use
+	params = params or {}
+	if name == "nprobe":
+		ps.set_index_parameter(index, name, min(int(params.get("nprobe", 16)), ivf.nlist))
+	elif name == "efSearch":
+		ps.set_index_parameter(index, name, int(params.get("ef_search", 64)))
+	r, ms = recall(index)
+	storage = [{"index": f"{params.get('type', 'index')} (built)", "mb": index_mb(index), "recall": r, "ms_per_query": ms}]
+	del exact
+	sample = embs[np.sort(rng.choice(live, size=min(len(live), 100000), replace=False))]
+	for kind in ("flat", "sq_fp16", "sq8"):
+		alt = make_index({"type": kind}, sample)
+		for start in range(0, len(live), 100000):
+			chunk = live[start:start + 100000]
+			alt.add_with_ids(np.ascontiguousarray(embs[chunk], dtype=np.float32), chunk)
+		r, ms = recall(alt)
+		storage.append({"index": kind, "mb": index_mb(alt), "recall": r, "ms_per_query": ms})
+		del alt
+	emb = {"dtype": str(embs.dtype), "mb": file_mb(emb_path) if emb_path else embs.nbytes / (1024.0 * 1024.0)}
+
+	print(f"\nFootprint ({len(live)} docs, {embs.shape[1]} dims); embeddings.npy is {emb['dtype']}, {emb['mb']:.1f} MB on disk:")
+	for r in storage:
+		per = 1024.0 * 1024.0 * r["mb"] / max(1, len(live))
+		print(f"  {r['index']:<22} {r['mb']:9.1f} MB  {per:7.0f} B/doc  recall={r['recall']:.4f}  {r['ms_per_query']:.3f} ms/query")
+	return {"k": k, "queries": len(queries), "docs": len(live), "results": rows, "storage": storage, "embeddings": emb}
+
+
+
+
 if __name__ == "__main__":
 	ap = argparse.ArgumentParser()
 	ap.add_argument("--input", required=True)
 	ap.add_argument("--outdir", required=True)
 	ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+	ap.add_argument("--incremental", action="store_true", help="re-embed only new/changed tickets of an existing index in --outdir")
+	ap.add_argument("--config", default="config.toml", help="reads index type and parameters from its [index] section")
+	ap.add_argument("--index-type", choices=INDEX_TYPES, help="overrides [index] type")
+	ap.add_argument("--emb-dtype", choices=["float32", "float16"], help="embeddings.npy storage; overrides [index] emb_dtype")
+	ap.add_argument("--no-bm25", action="store_true", help="skip building the BM25 keyword index")
+	ap.add_argument("--shard-by", choices=["project", "component", "none"], default="project", help="per-project (or project/component) shards for routed search")
+	ap.add_argument("--workers", type=int, default=1, help="encoder processes (sentence-transformers multi-process pool)")
+	ap.add_argument("--chunk-size", type=int, default=10000, help="documents read, encoded and written per step")
+	ap.add_argument("--batch-size", type=int, default=64)
+	ap.add_argument("--publish", action="store_true", help="build a new version under --outdir/versions/ and point --outdir/CURRENT at it")
+	ap.add_argument("--keep", type=int, default=3, help="with --publish: index versions to keep, including the new one")
+	ap.add_argument("--duplicates", action="store_true", help="also cluster near-duplicate tickets ([duplicates] settings)")
+	ap.add_argument("--report", action="store_true", help="print recall/latency against exact search and the memory footprint of flat / sq_fp16 / sq8 after building")
+	ap.add_argument("--report-out", help="also write the report as JSON to this path")
 	args = ap.parse_args()
+	params = load_index_params(args.config, args.index_type, args.emb_dtype)
 
 	os.makedirs(args.outdir, exist_ok=True)
+	workdir = args.outdir
+	if args.publish:
+		# the running service only sees the new version once CURRENT is flipped below
+		version = new_version()
+		workdir = version_dir(args.outdir, version) + ".tmp"
+		shutil.rmtree(workdir, ignore_errors=True)
+		prev = current_version(args.outdir)
+		if args.incremental and prev is not None:
+			shutil.copytree(version_dir(args.outdir, prev), workdir)
+		else:
+			os.makedirs(workdir)
 
-	model = SentenceTransformer(args.model)
-	texts, metas = [], []
-	for rec in iter_jsonl(args.input):
-		text = f"{rec.get('summary','')}\n\n{rec.get('description','')}"
-		texts.append(text)
-		metas.append({"key": rec.get("key"), "summary": rec.get("summary"), "description": rec.get("description")})
-
-	embs = model.encode(texts, convert_to_numpy=True, show_progress_bar=True, batch_size=64, normalize_embeddings=True)
-	dim = embs.shape[1]
-	index = faiss.IndexFlatIP(dim)
-	index.add(embs)
+	from sentence_transformers import SentenceTransformer  # slow import; keep --help fast
+	embedder = Embedder(SentenceTransformer(args.model), workers=args.workers, batch_size=args.batch_size)
+	try:
+		if args.incremental and os.path.exists(os.path.join(workdir, "faiss_index.bin")):
+			index, live = build_incremental(embedder, args.input, workdir, chunk_size=args.chunk_size)
+		else:
+			index, live = build_full(embedder, args.input, params, workdir, chunk_size=args.chunk_size)
+			print(f"Built {params['type']} index.")
+	finally:
+		embedder.close()
+	print(f"Indexed {index.ntotal} documents.")
+	if not args.no_bm25:
+		build_bm25(workdir, live)
+	if args.shard_by != "none":
+		build_project_shards(workdir, live, params, args.shard_by)
+	else:
+		shutil.rmtree(os.path.join(workdir, "shards"), ignore_errors=True)
+	if args.duplicates:
+		build_duplicates(workdir, live, duplicate_settings(load_config(args.config)))
+	else:
+		# carried over from the previous version by an incremental --publish, and now stale
+		if os.path.exists(os.path.join(workdir, "duplicates.json")):
+			os.remove(os.path.join(workdir, "duplicates.json"))
 
-	faiss.write_index(index, os.path.join(args.outdir, "faiss_index.bin"))
-	np.save(os.path.join(args.outdir, "embeddings.npy"), embs)
-	with open(os.path.join(args.outdir, "meta.json"), "w", encoding="utf-8") as f:
-		json.dump(metas, f, ensure_ascii=False)
+	if args.report or args.report_out:
+		embs = np.load(os.path.join(workdir, "embeddings.npy"), mmap_mode="r")
+		report = recall_report(index, embs, live, emb_path=os.path.join(workdir, "embeddings.npy"), params=params)
+		report["index"] = params
+		if args.report_out:
+			with open(args.report_out, "w", encoding="utf-8") as f:
+				json.dump(report, f, indent=2)
 
-	print(f"Indexed {len(texts)} documents.")
\ No newline at end of file
+	if args.publish:
+		os.rename(workdir, version_dir(args.outdir, version))
+		set_current(args.outdir, version)
+		prune_versions(args.outdir, args.keep)
+		print(f"Published index version {version}.")
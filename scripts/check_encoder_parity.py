@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import json
+import argparse
+import tomli
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service.encoder import load_backend
+from service.metastore import MetaStore
+from service.storage import read_index
+from service.versions import versioned_config
+
+
+"""
+Check that an alternative encoder backend (quantized / onnx) retrieves the same
+top-k as the PyTorch encoder. Exits non-zero when the mean top-k overlap or the
+minimum cosine between the two embeddings falls below tolerance.
+
+Index and meta paths resolve like the service's: the version in CURRENT
+(or --version) when build_index.py --publish is in use, else [index] paths.
+"""
+
+
+def sample_queries(args, params):
+	if args.queries:
+		with open(args.queries, "r", encoding="utf-8") as f:
+			lines = [l.strip() for l in f if l.strip()]
+		return [json.loads(l).get("vague_text", "") if l.startswith("{") else l for l in lines][:args.n]
+	store = MetaStore(params.get("meta_path", "index/meta.jsonl"))
+	rng = np.random.default_rng(0)
+	ids = rng.choice(len(store), size=min(args.n, len(store)), replace=False)
+	return [store.raw(int(i))["summary"] or "" for i in ids]
+
+
+
+
+def timed_encode(backend, queries):
+	backend.encode(queries[:4])  # warm-up
+	t0 = time.perf_counter()
+	embs = np.asarray(backend.encode(queries), dtype=np.float32)
+	return embs, 1000.0 * (time.perf_counter() - t0) / len(queries)
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--config", default="config.toml")
+	ap.add_argument("--version", help="index version to check against (default: the one in CURRENT)")
+	ap.add_argument("--backend", required=True, choices=["quantized", "onnx"])
+	ap.add_argument("--queries", help="text or JSONL (vague_text) queries; default: ticket summaries from the meta store")
+	ap.add_argument("--n", type=int, default=200)
+	ap.add_argument("--k", type=int, default=5)
+	ap.add_argument("--min-overlap", type=float, default=0.9, help="mean top-k overlap required")
+	ap.add_argument("--min-cosine", type=float, default=0.98, help="minimum cosine between the two embeddings")
+	args = ap.parse_args()
+
+	with open(args.config, "rb") as f:
+		params = versioned_config(tomli.load(f), args.version)["index"]
+	queries = sample_queries(args, params)
+	index = read_index(params["faiss_path"], params.get("mmap", False))
+
+	ref, ref_ms = timed_encode(load_backend({**params, "encoder_backend": "torch"}), queries)
+	cand, cand_ms = timed_encode(load_backend({**params, "encoder_backend": args.backend}), queries)
+
+	cos = (ref * cand).sum(axis=1)
+	_, I_ref = index.search(ref, args.k)
+	_, I_cand = index.search(cand, args.k)
+	overlap = np.mean([len(set(a) & set(b)) / float(args.k) for a, b in zip(I_ref.tolist(), I_cand.tolist())])
+
+	print(f"{len(queries)} queries, top-{args.k}")
+	print(f"  torch      {ref_ms:.3f} ms/query")
+	print(f"  {args.backend:<10} {cand_ms:.3f} ms/query")
+	print(f"  cosine     min={cos.min():.4f} mean={cos.mean():.4f}")
+	print(f"  overlap    mean={overlap:.4f}")
+	ok = overlap >= args.min_overlap and cos.min() >= args.min_cosine
+	print("PASS" if ok else "FAIL")
+	sys.exit(0 if ok else 1)
\ No newline at end of file
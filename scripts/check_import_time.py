@@ -0,0 +1,79 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+
+"""
+Import-time budget for the service: imports a module in a fresh interpreter
+with `python -X importtime`, prints the slowest top-level packages and fails
+if the total exceeds --budget-ms or a forbidden package was loaded.
+
+  python scripts/check_import_time.py                              # service.app, PROVIDER=openai
+  python scripts/check_import_time.py --provider huggingface --budget-ms 1500
+"""
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["torch", "transformers", "sentence_transformers", "faiss", "peft", "onnxruntime"]
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+PROBE = "import sys, json; import {module}; print(json.dumps(sorted(m.split('.')[0] for m in sys.modules)))"
+
+
+
+
+def measure(module: str, env: dict):
+	proc = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+		cwd=ROOT, env=env, capture_output=True, text=True,
+	)
+	if proc.returncode != 0:
+		raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+	# top-level rows are the ones with the least indentation; cumulative time is in µs
+	rows = []
+	for line in proc.stderr.splitlines():
+		m = LINE_RE.match(line)
+		if m:
+			rows.append((len(m.group(3)), int(m.group(2)), m.group(4)))
+	top = min(r[0] for r in rows)
+	tops = [(name, us / 1000.0) for depth, us, name in rows if depth == top]
+	loaded = set(json.loads(proc.stdout.strip().splitlines()[-1]))
+	return tops, loaded
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--module", default="service.app")
+	ap.add_argument("--provider", default="openai", help="PROVIDER value to import under")
+	ap.add_argument("--budget-ms", type=float, default=1500.0)
+	ap.add_argument("--forbid", default=",".join(HEAVY), help="comma-separated packages that must not be imported")
+	ap.add_argument("--runs", type=int, default=3, help="best-of runs, to smooth out disk cache effects")
+	ap.add_argument("--top", type=int, default=10)
+	args = ap.parse_args()
+
+	env = dict(os.environ, PROVIDER=args.provider)
+	best = None
+	for _ in range(args.runs):
+		tops, loaded = measure(args.module, env)
+		total = sum(ms for _, ms in tops)
+		if best is None or total < best[0]:
+			best = (total, tops, loaded)
+	total, tops, loaded = best
+
+	print(f"import {args.module} (PROVIDER={args.provider}): {total:.0f} ms, budget {args.budget_ms:.0f} ms")
+	for name, ms in sorted(tops, key=lambda x: -x[1])[:args.top]:
+		print(f"  {ms:8.1f} ms  {name}")
+
+	forbidden = sorted(set(p for p in args.forbid.split(",") if p) & loaded)
+	failed = False
+	if forbidden:
+		print(f"FAIL: heavy packages imported: {', '.join(forbidden)}")
+		failed = True
+	if total > args.budget_ms:
+		print(f"FAIL: over budget by {total - args.budget_ms:.0f} ms")
+		failed = True
+	sys.exit(1 if failed else 0)
@@ -0,0 +1,67 @@
+import json
+import argparse
+import requests
+
+
+"""
+Bulk-enhance tickets through the /enhance/batch endpoint.
+Input: JSONL of EnhanceRequest objects ({"project_key": ..., "vague_text": ..., ...}).
+Output: JSONL with one line per input; `index` is the line number in the input file.
+"""
+
+
+def iter_jsonl(path):
+	with open(path, "r", encoding="utf-8") as f:
+		for line in f:
+			if line.strip():
+				yield json.loads(line)
+
+
+
+
+def chunks(it, size):
+	buf = []
+	for x in it:
+		buf.append(x)
+		if len(buf) == size:
+			yield buf
+			buf = []
+	if buf:
+		yield buf
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--input", required=True)
+	ap.add_argument("--output", required=True)
+	ap.add_argument("--url", default="http://localhost:8000")
+	ap.add_argument("--chunk", type=int, default=500, help="requests per /enhance/batch call")
+	ap.add_argument("--concurrency", type=int, default=4, help="LLM calls in flight per batch")
+	ap.add_argument("--project", help="default project_key for lines that omit it")
+	args = ap.parse_args()
+
+	session = requests.Session()
+	done = errors = offset = 0
+	with open(args.output, "w", encoding="utf-8") as out:
+		for batch in chunks(iter_jsonl(args.input), args.chunk):
+			if args.project:
+				for item in batch:
+					item.setdefault("project_key", args.project)
+			body = {"items": batch, "concurrency": args.concurrency}
+			with session.post(f"{args.url}/enhance/batch", json=body, stream=True, timeout=(5, None)) as r:
+				r.raise_for_status()
+				for line in r.iter_lines():
+					if not line:
+						continue
+					res = json.loads(line)
+					res["index"] += offset
+					errors += "error" in res
+					done += 1
+					out.write(json.dumps(res, ensure_ascii=False) + "\n")
+				out.flush()
+			offset += len(batch)
+			print(f"{done} done, {errors} errors")
+
+	print(f"Wrote {done} results ({errors} errors) to {args.output}")
\ No newline at end of file
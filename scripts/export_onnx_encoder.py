@@ -0,0 +1,56 @@
+import os
+import argparse
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+
+"""
+Export the transformer part of a sentence-transformers model to ONNX for the
+`onnx` encoder backend. Pooling and normalization happen in service/encoder.py.
+"""
+
+
+class _Wrapper(torch.nn.Module):
+	def __init__(self, model):
+		super().__init__()
+		self.model = model
+
+	def forward(self, input_ids, attention_mask):
+		return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+	ap.add_argument("--out", default="models/encoder-onnx")
+	ap.add_argument("--quantize", action="store_true", help="also write int8 dynamically quantized weights (model.onnx is replaced)")
+	args = ap.parse_args()
+
+	os.makedirs(args.out, exist_ok=True)
+	tok = AutoTokenizer.from_pretrained(args.model)
+	model = AutoModel.from_pretrained(args.model).eval()
+	sample = tok(["export sample"], return_tensors="pt")
+	path = os.path.join(args.out, "model.onnx")
+	kwargs = {"dynamo": False} if "dynamo" in torch.onnx.export.__code__.co_varnames else {}
+	torch.onnx.export(
+		_Wrapper(model),
+		(sample["input_ids"], sample["attention_mask"]),
+		path,
+		input_names=["input_ids", "attention_mask"],
+		output_names=["last_hidden_state"],
+		dynamic_axes={"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}, "last_hidden_state": {0: "batch", 1: "seq"}},
+		opset_version=17,
+		**kwargs
+	)
+	tok.save_pretrained(args.out)
+
+	if args.quantize:
+		from onnxruntime.quantization import quantize_dynamic, QuantType
+		tmp = path + ".fp32"
+		os.replace(path, tmp)
+		quantize_dynamic(tmp, path, weight_type=QuantType.QInt8)
+		os.remove(tmp)
+
+	print("Exported ONNX encoder to", args.out)
\ No newline at end of file
@@ -0,0 +1,51 @@
+import os
+import sys
+import argparse
+import tomli
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service.metastore import MetaStore, live_ids
+from service.duplicates import duplicate_settings
+from service.versions import versioned_config
+from scripts.build_index import build_duplicates
+
+
+"""
+Offline near-duplicate job for an existing index: clusters every live ticket
+whose embedding is within the cosine threshold of another and writes
+duplicates.json next to embeddings.npy, which /duplicates then reads.
+
+  python scripts/find_duplicates.py --config config.toml
+  python scripts/find_duplicates.py --index-dir index/versions/<version> --threshold 0.95
+
+Defaults to the version index/CURRENT points at (or the flat [index] paths).
+A running service picks the file up on its next version change, or right away
+with POST /admin/index/reload {"force": true}. `build_index.py --duplicates`
+runs the same job as part of a build.
+"""
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--config", default="config.toml")
+	ap.add_argument("--index-dir", help="directory with embeddings.npy and meta.jsonl; default: the live index from --config")
+	ap.add_argument("--threshold", type=float, help="cosine similarity for a duplicate pair; overrides [duplicates] threshold")
+	ap.add_argument("--block", type=int, help="rows per matrix-multiply block; memory is block x block floats")
+	ap.add_argument("--max-neighbors", type=int, help="closest duplicates kept per ticket")
+	args = ap.parse_args()
+
+	with open(args.config, "rb") as f:
+		cfg = tomli.load(f)
+	settings = duplicate_settings(cfg)
+	for key in ("threshold", "block", "max_neighbors"):
+		if getattr(args, key) is not None:
+			settings[key] = getattr(args, key)
+
+	outdir = args.index_dir or os.path.dirname(versioned_config(cfg)["index"]["emb_path"]) or "."
+	store = MetaStore(os.path.join(outdir, "meta.jsonl"))
+	live = live_ids(store)
+	store.close()
+	print(f"{len(live)} live tickets in {outdir}")
+	build_duplicates(outdir, live, settings)
@@ -1,26 +1,93 @@
-import json
-from datasets import load_dataset
+import os
+import sys
+import hashlib
+import torch
+from datasets import load_dataset, load_from_disk
 from transformers import T5ForConditionalGeneration, T5TokenizerFast, DataCollatorForSeq2Seq, Trainer, TrainingArguments
 from peft import LoraConfig, get_peft_model, TaskType
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service.cpus import usable_cpus
+
 
 """
 Lightweight contextual training with LoRA on T5-base.
 Input: vague summary; Target: structured description.
 This is compute-friendly and good for a POC.
+
+Tokenized pairs are cached under --cache-dir/<key> as Arrow files and
+memory-mapped on later runs. The key covers the tokenizer (name and
+vocabulary), the prompt prefix, both max lengths and the content of the JSONL,
+so editing any of them re-tokenizes and nothing else does. --tokenize-only
+fills the cache without loading the model.
+
+Batches are drawn from groups of similar length (group_by_length) so the
+collator pads to the longest pair in a batch of near-equals, not to a random
+long one. --precision auto picks bf16 (or fp16) on CUDA and fp32 on CPU;
+--threads sets the torch intra-op pool, by default every core this process
+may run on.
 """
 
 
+PREFIX = "Enhance defect: "
+
+
+
+
+def file_sha1(path: str) -> str:
+	h = hashlib.sha1()
+	with open(path, "rb") as f:
+		for chunk in iter(lambda: f.read(1 << 20), b""):
+			h.update(chunk)
+	return h.hexdigest()
+
+
+
+
+def cache_key(tokenizer, path: str, max_source: int, max_target: int) -> str:
+	vocab = hashlib.sha1(tokenizer.backend_tokenizer.to_str().encode("utf-8")).hexdigest()
+	parts = [tokenizer.name_or_path, vocab, PREFIX, str(max_source), str(max_target), file_sha1(path)]
+	return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+
+
+def tokenized(path: str, tokenizer, cache_dir: str, max_source: int, max_target: int, num_proc: int = 1):
+	"""Tokenized dataset for a JSONL of {input, target}, built once per cache key."""
+	out = os.path.join(cache_dir, cache_key(tokenizer, path, max_source, max_target))
+	if os.path.isdir(out):
+		print(f"Using tokenized cache {out}")
+		return load_from_disk(out)
+
+	def preprocess(ex):
+		x = tokenizer([f"{PREFIX}{e}" for e in ex["input"]], max_length=max_source, truncation=True)
+		y = tokenizer(text_target=ex["target"], max_length=max_target, truncation=True)
+		x["labels"] = y["input_ids"]
+		# encoder and decoder are both padded to the batch maximum
+		x["length"] = [len(a) + len(b) for a, b in zip(x["input_ids"], y["input_ids"])]
+		return x
+
+	ds = load_dataset("json", data_files={"data": path})["data"]
+	ds = ds.map(
+		preprocess, batched=True, remove_columns=ds.column_names,
+		num_proc=num_proc if num_proc > 1 and len(ds) >= 10000 else None,
+	)
+	tmp = out + ".tmp"
+	ds.save_to_disk(tmp)
+	os.replace(tmp, out)
+	print(f"Tokenized {len(ds)} pairs from {path} -> {out}")
+	# reopen from disk so training reads the memory-mapped files, not the map() cache
+	return load_from_disk(out)
+
 
 
-def jsonl_to_hf(path):
-	def gen():
-		with open(path, "r", encoding="utf-8") as f:
-			for line in f:
-				if line.strip():
-					j = json.loads(line)
-					yield {"input": j["input"], "target": j["target"]}
-	return load_dataset("json", data_files={"train": path}, split="train").map(lambda _: _)
+
+def resolve_precision(name: str) -> str:
+	if name != "auto":
+		return name
+	if not torch.cuda.is_available():
+		return "fp32"
+	return "bf16" if torch.cuda.is_bf16_supported() else "fp16"
 
 
 
@@ -32,9 +99,32 @@ if __name__ == "__main__":
 	ap.add_argument("--eval", required=True)
 	ap.add_argument("--out", required=True)
 	ap.add_argument("--base", default="google/flan-t5-base")
+	ap.add_argument("--cache-dir", default="data/tokenized")
+	ap.add_argument("--max-source", type=int, default=256)
+	ap.add_argument("--max-target", type=int, default=512)
+	ap.add_argument("--batch-size", type=int, default=8)
+	ap.add_argument("--grad-accum", type=int, default=2)
+	ap.add_argument("--lr", type=float, default=2e-4)
+	ap.add_argument("--epochs", type=float, default=3)
+	ap.add_argument("--precision", choices=["auto", "fp32", "fp16", "bf16"], default="auto")
+	ap.add_argument("--threads", type=int, default=usable_cpus())
+	ap.add_argument("--workers", type=int, default=0, help="DataLoader worker processes")
+	ap.add_argument("--tokenize-only", action="store_true", help="fill the tokenized cache and exit")
 	args = ap.parse_args()
 
+	torch.set_num_threads(args.threads)
 	tokenizer = T5TokenizerFast.from_pretrained(args.base)
+	train_ds = tokenized(args.train, tokenizer, args.cache_dir, args.max_source, args.max_target, args.threads)
+	eval_ds = tokenized(args.eval, tokenizer, args.cache_dir, args.max_source, args.max_target, args.threads)
+	if args.tokenize_only:
+		raise SystemExit(0)
+
+	precision = resolve_precision(args.precision)
+	cuda = torch.cuda.is_available()
+	if precision == "fp16" and not cuda:
+		raise SystemExit("fp16 training needs a GPU; use --precision bf16 or fp32 on CPU")
+	print(f"Device: {'cuda' if cuda else 'cpu'}, precision: {precision}, threads: {torch.get_num_threads()}")
+
 	model = T5ForConditionalGeneration.from_pretrained(args.base)
 
 	lora_config = LoraConfig(
@@ -44,43 +134,30 @@ if __name__ == "__main__":
 	)
 	model = get_peft_model(model, lora_config)
 
-	def preprocess(ex):
-		x = tokenizer(
-			[f"Enhance defect: {e}" for e in ex["input"]],
-			max_length=256, truncation=True
-		)
-		y = tokenizer(text_target=ex["target"], max_length=512, truncation=True)
-		x["labels"] = y["input_ids"]
-		return x
-
-	train_ds = load_dataset("json", data_files={"train": args.train})["train"].map(preprocess, batched=True, remove_columns=["input", "target"])
-	eval_ds = load_dataset("json", data_files={"eval": args.eval})["eval"].map(preprocess, batched=True, remove_columns=["input", "target"])
-
-	collator = DataCollatorForSeq2Seq(tokenizer, model=model)
+	# multiples of 8 keep half-precision matmuls on tensor cores
+	collator = DataCollatorForSeq2Seq(tokenizer, model=model, pad_to_multiple_of=8 if precision != "fp32" else None)
 
 	targs = TrainingArguments(
 		output_dir=args.out,
-		per_device_train_batch_size=4,
-		per_device_eval_batch_size=4,
-		gradient_accumulation_steps=4,
-		learning_rate=2e-4,
-		num_train_epochs=3,
-		evaluation_strategy="epoch",
+		per_device_train_batch_size=args.batch_size,
+		per_device_eval_batch_size=args.batch_size,
+		gradient_accumulation_steps=args.grad_accum,
+		learning_rate=args.lr,
+		num_train_epochs=args.epochs,
+		eval_strategy="epoch",
 		save_strategy="epoch",
 		logging_steps=50,
-		fp16=True
+		group_by_length=True,
+		length_column_name="length",
+		fp16=precision == "fp16",
+		bf16=precision == "bf16",
+		use_cpu=not cuda,
+		dataloader_num_workers=args.workers,
+		dataloader_pin_memory=cuda,
 	)
 
 	trainer = Trainer(model=model, args=targs, train_dataset=train_ds, eval_dataset=eval_ds, data_collator=collator)
-	trainer = Trainer(
-		model=model,
-		args=targs,
-		train_dataset=train_ds,
-		eval_dataset=eval_ds,
-		data_collator=collator,
-		predict_with_generate=True
-	)
 	trainer.train()
 	trainer.save_model(args.out)
 	tokenizer.save_pretrained(args.out)
-	print("Saved LoRA model to", args.out)
\ No newline at end of file
+	print("Saved LoRA model to", args.out)
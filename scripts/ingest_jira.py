@@ -1,7 +1,12 @@
 import os
 import json
+import time
+import random
 import argparse
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 
 
@@ -15,53 +20,173 @@ TOKEN = os.getenv("JIRA_API_TOKEN")
 
 HEADERS = {"Accept": "application/json"}
 AUTH = (EMAIL, TOKEN)
+PAGE_SIZE = 100
+FIELDS = [
+	"summary",
+	"description",
+	"issuetype",
+	"created",
+	"updated",
+	"labels",
+	"components",
+	"priority",
+	"environment"
+]
+
+
+
+
+def make_session(pool_size: int):
+	s = requests.Session()
+	s.auth = AUTH
+	s.headers.update(HEADERS)
+	adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+	s.mount("http://", adapter)
+	s.mount("https://", adapter)
+	return s
+
+
+
+
+def to_record(it):
+	fields = it.get("fields", {})
+	return {
+		"key": it.get("key"),
+		"summary": fields.get("summary") or "",
+		"description": (fields.get("description") or ""),
+		"labels": fields.get("labels") or [],
+		"components": [c.get("name") for c in (fields.get("components") or [])],
+		"priority": (fields.get("priority") or {}).get("name"),
+		"environment": fields.get("environment") or "",
+		"issuetype": (fields.get("issuetype") or {}).get("name"),
+		"created": fields.get("created"),
+		"updated": fields.get("updated"),
+	}
+
+
+
+
+def fetch_page(session, base, jql, start, size, retries=6):
+	params = {"jql": jql, "startAt": start, "maxResults": size, "fields": FIELDS}
+	for attempt in range(retries + 1):
+		try:
+			r = session.get(f"{base}/rest/api/3/search", params=params, timeout=(5, 60))
+		except (requests.ConnectionError, requests.Timeout):
+			# a dropped connection or a stalled read is retried like a 5xx
+			if attempt == retries:
+				raise
+			time.sleep(min(60.0, 2 ** attempt) + random.uniform(0, 0.5))
+			continue
+		if r.status_code in (429, 502, 503, 504) and attempt < retries:
+			# honour Retry-After when Jira sends it, otherwise back off exponentially with jitter
+			delay = r.headers.get("Retry-After")
+			delay = float(delay) if delay and delay.replace(".", "", 1).isdigit() else min(60.0, 2 ** attempt)
+			time.sleep(delay + random.uniform(0, 0.5))
+			continue
+		r.raise_for_status()
+		return r.json()
 
 
 
 
-def fetch_issues(jql: str, limit: int = 500):
-	start = 0
-	all_issues = []
-	while True:
-		params = {
-			"jql": jql,
-			"startAt": start,
-			"maxResults": min(100, limit - start),
-			"fields": [
-				"summary",
-				"description",
-				"issuetype",
-				"created",
-				"updated",
-				"labels",
-				"components",
-				"priority",
-				"environment"
-			]
-		}
-		r = requests.get(f"{BASE}/rest/api/3/search", headers=HEADERS, params=params, auth=AUTH)
-		r.raise_for_status()
-		data = r.json()
-		issues = data.get("issues", [])
-		for it in issues:
-			fields = it.get("fields", {})
-			rec = {
-				"key": it.get("key"),
-				"summary": fields.get("summary") or "",
-				"description": (fields.get("description") or ""),
-				"labels": fields.get("labels") or [],
-				"components": [c.get("name") for c in (fields.get("components") or [])],
-				"priority": (fields.get("priority") or {}).get("name"),
-				"environment": fields.get("environment") or "",
-				"issuetype": (fields.get("issuetype") or {}).get("name"),
-				"created": fields.get("created"),
-				"updated": fields.get("updated"),
-			}
-			all_issues.append(rec)
-		start += len(issues)
-		if start >= limit or len(issues) == 0:
-			break
-	return all_issues
+def since_jql(jql: str, since: str):
+	# Jira ISO timestamps ("2024-05-01T10:22:33.000+0000") -> JQL "yyyy/MM/dd HH:mm"
+	stamp = since[:16].replace("-", "/").replace("T", " ")
+	return f'({jql}) AND updated >= "{stamp}"'
+
+
+
+
+def ordered_jql(jql: str):
+	# page offsets only stay put if the sort fields never change: ordering by `updated`
+	# would move a ticket edited mid-fetch to the end and shift every later page.
+	# The high-water mark is still the largest `updated` seen.
+	return jql if "order by" in jql.lower() else f"{jql} ORDER BY created ASC, key ASC"
+
+
+
+
+def load_state(path):
+	if path and os.path.exists(path):
+		with open(path, "r", encoding="utf-8") as f:
+			return json.load(f)
+	return {}
+
+
+
+
+def save_state(path, state):
+	tmp = path + ".tmp"
+	with open(tmp, "w", encoding="utf-8") as f:
+		json.dump(state, f, indent=2)
+	os.replace(tmp, path)
+
+
+
+
+def fetch_issues(jql: str, limit: int = 500, out: str = None, state_path: str = None, workers: int = 4, base: str = None):
+	"""
+	Page through /rest/api/3/search with `workers` concurrent requests and append
+	each page to `out` as soon as it arrives. Finished page offsets are checkpointed
+	in `state_path`, so a rerun with the same query skips them and continues.
+	Returns (records written, highest `updated` seen).
+	"""
+	base = base or BASE
+	state = load_state(state_path)
+	ckpt = state.get("checkpoint") or {}
+	if ckpt.get("jql") != jql or ckpt.get("out") != out:
+		ckpt = {"jql": jql, "out": out, "done": [], "high_water": None}
+	done = set(ckpt["done"])
+	resuming = bool(done)
+
+	session = make_session(workers)
+	first = fetch_page(session, base, jql, 0, min(PAGE_SIZE, limit))
+	total = min(limit, first.get("total", 0))
+	starts = [s for s in range(0, total, PAGE_SIZE) if s not in done]
+
+	lock = threading.Lock()
+	written = 0
+	high_water = ckpt.get("high_water")
+	with open(out, "a" if resuming else "w", encoding="utf-8") as f:
+		def write_page(start, data):
+			nonlocal written, high_water
+			recs = [to_record(it) for it in data.get("issues", [])]
+			with lock:
+				for rec in recs:
+					f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+					if rec["updated"] and (high_water is None or rec["updated"] > high_water):
+						high_water = rec["updated"]
+				f.flush()
+				written += len(recs)
+				done.add(start)
+				ckpt["done"] = sorted(done)
+				ckpt["high_water"] = high_water
+				state["checkpoint"] = ckpt
+				if state_path:
+					save_state(state_path, state)
+
+		if 0 in starts:
+			write_page(0, first)
+			starts.remove(0)
+
+		with ThreadPoolExecutor(max_workers=workers) as pool:
+			pending = {}
+			queue = list(reversed(starts))
+			while queue or pending:
+				# keep at most 2 pages per worker in flight so memory stays bounded
+				while queue and len(pending) < workers * 2:
+					start = queue.pop()
+					pending[pool.submit(fetch_page, session, base, jql, start, min(PAGE_SIZE, total - start))] = start
+				finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+				for fut in finished:
+					write_page(pending.pop(fut), fut.result())
+
+	state.pop("checkpoint", None)
+	if high_water and (state.get("high_water") is None or high_water > state["high_water"]):
+		state["high_water"] = high_water
+	if state_path:
+		save_state(state_path, state)
+	return written, high_water
 
 
 
@@ -71,11 +196,22 @@ if __name__ == "__main__":
 	ap.add_argument("--jql", required=True)
 	ap.add_argument("--limit", type=int, default=500)
 	ap.add_argument("--out", default="data/raw_jira_export.jsonl")
+	ap.add_argument("--since", nargs="?", const="auto",
+		help="only fetch issues updated since this Jira timestamp; with no value, since the stored high-water mark")
+	ap.add_argument("--state", help="checkpoint / high-water mark file (default: <out>.state.json)")
+	ap.add_argument("--workers", type=int, default=4, help="concurrent page requests")
+	ap.add_argument("--base-url", default=BASE, help="Jira base URL (defaults to JIRA_BASE_URL)")
 	args = ap.parse_args()
 
-	issues = fetch_issues(args.jql, args.limit)
-	with open(args.out, "w", encoding="utf-8") as f:
-		for issue in issues:
-			f.write(json.dumps(issue, ensure_ascii=False) + "\n")
-
-	print(f"Saved {len(issues)} issues to {args.out}")
\ No newline at end of file
+	state_path = args.state or args.out + ".state.json"
+	jql = args.jql
+	if args.since:
+		since = load_state(state_path).get("high_water") if args.since == "auto" else args.since
+		if since:
+			jql = since_jql(jql, since)
+		else:
+			print("No stored high-water mark yet; fetching everything.")
+	jql = ordered_jql(jql)
+
+	n, high_water = fetch_issues(jql, args.limit, out=args.out, state_path=state_path, workers=args.workers, base=args.base_url)
+	print(f"Saved {n} issues to {args.out} (updated high-water mark: {high_water})")
\ No newline at end of file
@@ -1,5 +1,14 @@
+import os
+import sys
 import json
+import hashlib
 import argparse
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service.cpus import usable_cpus
 
 
 """
@@ -7,6 +16,17 @@ Build supervised pairs from historical tickets. Heuristic:
 - input = short/vague summary
 - target = cleaned structured description synthesized from description + priority + environment
 For better results, curate manually or use a templater.
+
+The export is read in chunks of raw lines that worker processes turn into
+pairs; chunks are written back in input order as they finish, so memory stays
+at a few chunks per worker whatever the export size.
+
+A ticket goes to eval when a hash of its key falls in the --eval-fraction
+bucket, so the split doesn't move when the export is reordered or grows.
+Pairs are deduplicated by a hash of input + target, including against the
+pairs already in --output and --eval: rerunning on a bigger export only
+appends new pairs (a ticket whose text changed gets one more). --rebuild
+starts both files over.
 """
 
 
@@ -53,25 +73,103 @@ def to_structured(rec):
 
 
 
+def in_eval(key: str, fraction: float) -> bool:
+	return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % 10000 < fraction * 10000
+
+
+
+
+def pair_hash(pair) -> bytes:
+	return hashlib.sha1(f"{pair['input']}\n{pair['target']}".encode("utf-8")).digest()
+
+
+
+
+def make_pairs(lines, eval_fraction):
+	"""Worker: raw JSONL lines -> [(content hash, is_eval, serialized pair)]."""
+	out = []
+	for line in lines:
+		rec = json.loads(line)
+		pair = {
+			"input": rec.get("summary") or rec.get("key"),
+			"target": to_structured(rec)
+		}
+		h = pair_hash(pair)
+		# tickets without a key are split by content so reruns still agree
+		split_key = rec.get("key") or h.hex()
+		out.append((h, in_eval(split_key, eval_fraction), json.dumps(pair, ensure_ascii=False) + "\n"))
+	return out
+
+
+
+
+def iter_chunks(path, size):
+	with open(path, "r", encoding="utf-8") as f:
+		lines = (line for line in f if line.strip())
+		while True:
+			chunk = list(islice(lines, size))
+			if not chunk:
+				return
+			yield chunk
+
+
+
+
+def existing_hashes(*paths):
+	seen = set()
+	for path in paths:
+		if os.path.exists(path):
+			for pair in iter_jsonl(path):
+				seen.add(pair_hash(pair))
+	return seen
+
+
+
+
+def iter_results(chunks, eval_fraction, workers):
+	"""Pairs chunk by chunk, in input order, with at most 2 chunks per worker in flight."""
+	if workers <= 1:
+		for chunk in chunks:
+			yield make_pairs(chunk, eval_fraction)
+		return
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		pending = deque()
+		for chunk in chunks:
+			pending.append(pool.submit(make_pairs, chunk, eval_fraction))
+			if len(pending) >= workers * 2:
+				yield pending.popleft().result()
+		while pending:
+			yield pending.popleft().result()
+
+
+
+
 if __name__ == "__main__":
 	ap = argparse.ArgumentParser()
 	ap.add_argument("--input", required=True)
 	ap.add_argument("--output", required=True)
 	ap.add_argument("--eval", required=True)
+	ap.add_argument("--eval-fraction", type=float, default=0.1)
+	ap.add_argument("--workers", type=int, default=usable_cpus())
+	ap.add_argument("--chunk", type=int, default=2000, help="JSONL lines per worker task")
+	ap.add_argument("--rebuild", action="store_true", help="overwrite --output/--eval instead of appending")
 	args = ap.parse_args()
 
-	train, eval_ = [], []
-	for i, rec in enumerate(iter_jsonl(args.input)):
-		pair = {
-			"input": rec.get("summary") or rec.get("key"),
-			"target": to_structured(rec)
-		}
-		(eval_ if i % 10 == 0 else train).append(pair)
-
-	with open(args.output, "w", encoding="utf-8") as f:
-		for p in train:
-			f.write(json.dumps(p, ensure_ascii=False) + "\n")
-	with open(args.eval, "w", encoding="utf-8") as f:
-		for p in eval_:
-			f.write(json.dumps(p, ensure_ascii=False) + "\n")
-	print(f"Train: {len(train)}, Eval: {len(eval_)}")
\ No newline at end of file
+	mode = "w" if args.rebuild else "a"
+	seen = set() if args.rebuild else existing_hashes(args.output, args.eval)
+	kept = len(seen)
+	n_train = n_eval = dupes = 0
+	with open(args.output, mode, encoding="utf-8") as ft, open(args.eval, mode, encoding="utf-8") as fe:
+		for pairs in iter_results(iter_chunks(args.input, args.chunk), args.eval_fraction, args.workers):
+			for h, is_eval, line in pairs:
+				if h in seen:
+					dupes += 1
+					continue
+				seen.add(h)
+				if is_eval:
+					fe.write(line)
+					n_eval += 1
+				else:
+					ft.write(line)
+					n_train += 1
+	print(f"Train: +{n_train}, Eval: +{n_eval} (already present or duplicate: {dupes}, kept from previous runs: {kept})")
@@ -0,0 +1,181 @@
+import os
+import re
+import sys
+import json
+import tempfile
+import threading
+import subprocess
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+"""
+Runs scripts/ingest_jira.py against a local stub of /rest/api/3/search
+(--base-url), no Jira account needed:
+
+  python scripts/test_ingest_jira.py
+
+The stub honours `updated >= "..."` and ORDER BY in the JQL, answers every
+third request with 429, can fail one page with a 500, can drop connections
+without answering, and can edit a ticket while a fetch is running. Checks:
+resume after a failed page, dropped connections being retried, a ticket
+edited mid-fetch not shifting later pages, and --since.
+"""
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_jira.py")
+N = 250
+
+
+
+
+class StubJira:
+	def __init__(self, n):
+		self.issues = [
+			{"key": f"APP-{i}", "created": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}.000+0000", "updated": f"2026-01-02T00:{i // 60:02d}:{i % 60:02d}.000+0000"}
+			for i in range(n)
+		]
+		self.lock = threading.Lock()
+		self.requests = []
+		self.fail_at = None
+		self.drop = 0
+		self.edit_after_first = None
+		self.calls = 0
+
+	def edit(self, key, updated):
+		with self.lock:
+			next(it for it in self.issues if it["key"] == key)["updated"] = updated
+
+	def search(self, jql, start, size):
+		with self.lock:
+			if self.drop:
+				self.drop -= 1
+				return None, None
+			self.calls += 1
+			if self.calls % 3 == 0:
+				return 429, None
+			if start == self.fail_at:
+				return 500, None
+			self.requests.append(start)
+			issues = list(self.issues)
+			m = re.search(r'updated >= "([^"]+)"', jql)
+			if m:
+				since = m.group(1).replace("/", "-").replace(" ", "T")
+				issues = [it for it in issues if it["updated"][:16] >= since]
+			m = re.search(r"ORDER BY (\w+) ASC", jql)
+			if m:
+				issues.sort(key=lambda it: (it[m.group(1)], it["key"]))
+			page = issues[start:start + size]
+			if start == 0 and self.edit_after_first:
+				key, updated = self.edit_after_first
+				self.edit_after_first = None
+				next(it for it in self.issues if it["key"] == key)["updated"] = updated
+		return 200, {
+			"total": len(issues),
+			"issues": [{"key": it["key"], "fields": {"summary": it["key"], **it}} for it in page],
+		}
+
+	def serve(self):
+		stub = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				q = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+				status, body = stub.search(q["jql"][0], int(q["startAt"][0]), int(q["maxResults"][0]))
+				if status is None:
+					# close the socket without a response: the client sees a ConnectionError
+					self.close_connection = True
+					self.connection.close()
+					return
+				self.send_response(status)
+				if status == 429:
+					self.send_header("Retry-After", "0")
+				self.end_headers()
+				if body is not None:
+					self.wfile.write(json.dumps(body).encode("utf-8"))
+
+			def log_message(self, *args):
+				pass
+
+		server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		return server
+
+
+
+
+def ingest(base, out, *extra):
+	cmd = [sys.executable, SCRIPT, "--jql", "project=APP", "--limit", "10000", "--out", out, "--base-url", base, *extra]
+	return subprocess.run(cmd, capture_output=True, text=True)
+
+
+
+
+def keys(path):
+	with open(path, "r", encoding="utf-8") as f:
+		return [json.loads(line)["key"] for line in f if line.strip()]
+
+
+
+
+def main():
+	stub = StubJira(N)
+	server = stub.serve()
+	base = f"http://127.0.0.1:{server.server_address[1]}"
+	with tempfile.TemporaryDirectory() as tmp:
+		out = os.path.join(tmp, "export.jsonl")
+		state = out + ".state.json"
+
+		# a page fails after retries: progress so far is checkpointed
+		stub.fail_at = 100
+		r = ingest(base, out, "--workers", "1")
+		assert r.returncode != 0, "the run should fail on the 500 page"
+		with open(state, "r", encoding="utf-8") as f:
+			done = set(json.load(f)["checkpoint"]["done"])
+		assert 0 in done and 100 not in done, done
+		partial = keys(out)
+
+		# the rerun resumes: finished pages are not fetched again, nothing is written twice
+		stub.fail_at = None
+		stub.requests.clear()
+		r = ingest(base, out, "--workers", "4")
+		assert r.returncode == 0, r.stderr
+		# page 0 is always fetched again for the total, but not written again
+		assert not set(stub.requests[1:]) & done, stub.requests
+		got = keys(out)
+		assert len(got) == N and set(got) == {f"APP-{i}" for i in range(N)}, (len(partial), len(got))
+		print(f"resume: {len(partial)} issues before the failure, {len(got)} after the rerun")
+
+		# dropped connections are retried with backoff instead of aborting the run
+		stub.drop = 2
+		r = ingest(base, os.path.join(tmp, "dropped.jsonl"), "--workers", "1")
+		assert r.returncode == 0, r.stderr
+		assert stub.drop == 0 and len(keys(os.path.join(tmp, "dropped.jsonl"))) == N
+		print(f"dropped connections: retried, all {N} issues fetched")
+
+		# a ticket edited while the pull is running must not shift later pages
+		stub.edit_after_first = ("APP-3", "2026-03-01T00:00:00.000+0000")
+		full_state = os.path.join(tmp, "full.state.json")
+		r = ingest(base, os.path.join(tmp, "full.jsonl"), "--workers", "4", "--state", full_state)
+		assert r.returncode == 0, r.stderr
+		got = keys(os.path.join(tmp, "full.jsonl"))
+		assert sorted(got) == sorted(f"APP-{i}" for i in range(N)), f"{N - len(set(got))} issues skipped"
+		print(f"mid-fetch edit: all {len(got)} issues fetched once")
+
+		# --since only pulls tickets updated after the stored high-water mark
+		# (the boundary is inclusive, so APP-3, the high-water ticket itself, comes back too)
+		stub.edit("APP-7", "2026-04-01T00:00:00.000+0000")
+		stub.edit("APP-8", "2026-04-01T00:00:00.000+0000")
+		delta = os.path.join(tmp, "delta.jsonl")
+		r = ingest(base, delta, "--since", "--state", full_state)
+		assert r.returncode == 0, r.stderr
+		assert sorted(keys(delta)) == ["APP-3", "APP-7", "APP-8"], keys(delta)
+		print("since: fetched only the issues updated since the high-water mark")
+	server.shutdown()
+	print("OK")
+
+
+
+
+if __name__ == "__main__":
+	main()
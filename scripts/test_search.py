@@ -1,12 +1,19 @@
 # scripts/test_search.py
+import os
+import sys
 import faiss
 import json
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service.bm25 import BM25Index
+from service.priority import PriorityModel, keyword_priority, severity_of
+
 DATA_PATH = "data/dummy_bugs.jsonl"   # or your LSE dataset
 INDEX_PATH = "index/faiss_index.bin"  # built by build_index_dummy.py
 EMB_PATH = "index/embeddings.npy"
+PRIORITY_PATH = "models/priority.npz"  # built by train_priority.py
 
 # ---------------- Load dataset ----------------
 with open(DATA_PATH, "r", encoding="utf-8") as f:
@@ -14,10 +21,14 @@ with open(DATA_PATH, "r", encoding="utf-8") as f:
 
 # Load FAISS index + embeddings
 index = faiss.read_index(INDEX_PATH)
-embeddings = np.load(EMB_PATH)
+embeddings = np.load(EMB_PATH, mmap_mode="r")
 
 # Model for embeddings
 model = SentenceTransformer("all-MiniLM-L6-v2")
+priority_model = PriorityModel.load(PRIORITY_PATH) if PriorityModel.exists(PRIORITY_PATH) else None
+
+# Keyword index over the same bugs (ids = positions in `bugs`)
+keyword_index = BM25Index.build((i, f"{b['summary']}\n\n{b['description']}") for i, b in enumerate(bugs))
 
 
 # ---------------- Search ----------------
@@ -29,10 +40,9 @@ def search_bugs(query, k=10, keyword_match=True):
     results = [(bugs[idx], D[0][rank]) for rank, idx in enumerate(I[0])]
 
     if keyword_match:
-        keyword_hits = [
-            (bug, 0.0) for bug in bugs
-            if query.lower() in bug["summary"].lower() or query.lower() in bug["description"].lower()
-        ]
+        # BM25 inverted index instead of a substring scan over every bug
+        scores, ids = keyword_index.search(query, k=k)
+        keyword_hits = [(bugs[i], score) for score, i in zip(scores.tolist(), ids.tolist())]
         # Merge FAISS + keyword results (avoid duplicates)
         results_dict = {r[0]["summary"]: r for r in results}
         for bug, score in keyword_hits:
@@ -42,21 +52,15 @@ def search_bugs(query, k=10, keyword_match=True):
     return results
 
 
-# ---------------- Severity & Priority Heuristics ----------------
+# ---------------- Severity & Priority ----------------
 def suggest_severity_priority(bug):
-    """Heuristic rules to guess severity and priority."""
-    text = (bug["summary"] + " " + bug["description"]).lower()
-
-    if any(word in text for word in ["crash", "data loss", "not triggered", "unresponsive", "corruption", "failover"]):
-        return "Severity: Critical", "Priority: High"
-
-    if any(word in text for word in ["latency", "delay", "slow", "high cpu", "memory leak", "timeout"]):
-        return "Severity: Major", "Priority: Medium"
-
-    if any(word in text for word in ["ui", "format", "glitch", "display", "alignment"]):
-        return "Severity: Minor", "Priority: Low"
-
-    return "Severity: Major", "Priority: Medium"  # default fallback
+    """Trained classifier (scripts/train_priority.py) if available, else the keyword heuristic."""
+    text = bug["summary"] + " " + bug["description"]
+    if priority_model is not None:
+        priority = priority_model.predict(model.encode([text], normalize_embeddings=True))[0]["priority"]
+    else:
+        priority = keyword_priority([text])[0]
+    return f"Severity: {severity_of(priority)}", f"Priority: {priority}"
 
 
 # ---------------- Main Loop ----------------
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service import llm
+
+
+"""
+Checks that the huggingface micro-batcher survives cancelled callers (an
+/enhance/stream client disconnecting, a cancelled /enhance/batch task):
+
+  python scripts/test_t5_batching.py
+
+generate() is replaced by a 0.2 s fake, so no model is needed. One caller is
+cancelled while its prompt waits in the queue and one while its batch is
+running; requests after both must still complete.
+"""
+
+
+GENERATE_S = 0.2
+
+
+
+
+def fake_generate(loaded, prompts, adapter=None):
+	time.sleep(GENERATE_S)
+	return [f"out:{p}" for p in prompts]
+
+
+
+
+async def main():
+	llm._generate_t5_batch = fake_generate
+	llm.load_huggingface_t5 = lambda: None
+	scheduler = llm.get_scheduler()
+
+	# keep the batcher busy, then cancel a caller whose prompt is still queued
+	busy = asyncio.create_task(llm.agen_huggingface_t5("busy"))
+	await asyncio.sleep(0.05)
+	queued = asyncio.create_task(llm.agen_huggingface_t5("queued"))
+	await asyncio.sleep(0.01)
+	queued.cancel()
+	assert await busy == "out:busy"
+
+	# cancel a caller while generate() is running its batch
+	running = asyncio.create_task(llm.agen_huggingface_t5("running"))
+	await asyncio.sleep(0.05)
+	running.cancel()
+	await asyncio.sleep(GENERATE_S)
+
+	assert scheduler._thread.is_alive(), "t5-batcher thread died"
+	out = await asyncio.wait_for(llm.agen_huggingface_t5("after"), timeout=5)
+	assert out == "out:after", out
+	print(f"OK: batcher alive after 2 cancelled callers; stats {scheduler.stats()['batch_size_counts']}")
+
+
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
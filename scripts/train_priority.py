@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tomli
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service.metastore import MetaStore, doc_id, live_ids
+from service.priority import PriorityModel, keyword_priority
+from service.versions import versioned_config
+from scripts.build_index import iter_jsonl
+
+
+"""
+Train the priority classifier on an index's embeddings and the Jira `priority`
+field, and score it against the keyword heuristic on a held-out split.
+
+  python scripts/train_priority.py --config config.toml --out models/priority.npz
+  python scripts/train_priority.py --labels data/raw_jira_export.jsonl   # index built before priority was stored
+
+Tickets are split by a hash of their key, so a rerun on a grown index keeps
+old tickets on the same side. The saved model is the one trained on the train
+split, i.e. the one the reported numbers describe.
+"""
+
+
+
+
+def in_holdout(key: str, fraction: float) -> bool:
+	return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % 10000 < fraction * 10000
+
+
+
+
+def scores(truth, pred, classes):
+	truth, pred = np.asarray(truth), np.asarray(pred)
+	f1 = []
+	for c in classes:
+		tp = np.sum((pred == c) & (truth == c))
+		p = tp / max(1, np.sum(pred == c))
+		r = tp / max(1, np.sum(truth == c))
+		f1.append(2 * p * r / (p + r) if p + r else 0.0)
+	confusion = {t: {p: int(np.sum((truth == t) & (pred == p))) for p in classes} for t in classes}
+	return {"accuracy": float(np.mean(truth == pred)), "macro_f1": float(np.mean(f1)), "confusion": confusion}
+
+
+
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser()
+	ap.add_argument("--config", default="config.toml")
+	ap.add_argument("--index-dir", help="directory with embeddings.npy and meta.jsonl; default: the live index from --config")
+	ap.add_argument("--labels", help="JSONL with key and priority, for indexes whose meta store has no priority")
+	ap.add_argument("--out", help="default: [priority] model_path")
+	ap.add_argument("--holdout", type=float, default=0.2)
+	ap.add_argument("--min-count", type=int, default=20, help="drop priorities with fewer training tickets")
+	ap.add_argument("--epochs", type=int, default=200)
+	ap.add_argument("--lr", type=float, default=1.0)
+	ap.add_argument("--l2", type=float, default=1e-4)
+	ap.add_argument("--no-balance", action="store_true", help="don't reweight rare priorities")
+	ap.add_argument("--report-out", help="also write the report as JSON to this path")
+	args = ap.parse_args()
+
+	with open(args.config, "rb") as f:
+		cfg = tomli.load(f)
+	out = args.out or cfg.get("priority", {}).get("model_path", "models/priority.npz")
+	outdir = args.index_dir or os.path.dirname(versioned_config(cfg)["index"]["emb_path"]) or "."
+	labels = {r.get("key"): r.get("priority") for r in iter_jsonl(args.labels)} if args.labels else {}
+
+	store = MetaStore(os.path.join(outdir, "meta.jsonl"))
+	ids, keys, prios, texts = [], [], [], []
+	for i in live_ids(store).tolist():
+		m = store.raw(i)
+		prio = m.get("priority") or labels.get(m.get("key"))
+		if prio:
+			ids.append(i)
+			keys.append(doc_id(m) or str(i))
+			prios.append(prio)
+			texts.append(f"{m.get('summary') or ''} {m.get('description') or ''}")
+	store.close()
+	if not ids:
+		raise SystemExit("No tickets with a priority; rebuild the index from an export with `priority` or pass --labels.")
+
+	test = np.asarray([in_holdout(k, args.holdout) for k in keys])
+	train_prios = [p for p, t in zip(prios, test) if not t]
+	classes = sorted(c for c in set(train_prios) if train_prios.count(c) >= args.min_count)
+	known = np.asarray([p in classes for p in prios])
+	col = {c: j for j, c in enumerate(classes)}
+	ids = np.asarray(ids, dtype=np.int64)
+	tr, te = np.nonzero(~test & known)[0], np.nonzero(test & known)[0]
+	print(f"{len(ids)} labelled tickets, {len(tr)} train / {len(te)} held out, classes {classes}")
+
+	embs = np.load(os.path.join(outdir, "embeddings.npy"), mmap_mode="r")
+	t0 = time.perf_counter()
+	model = PriorityModel.train(
+		embs, [col[prios[i]] for i in tr], classes, ids=ids[tr], epochs=args.epochs, lr=args.lr, l2=args.l2,
+		balanced=not args.no_balance, embed_model=cfg.get("index", {}).get("embed_model"),
+	)
+	train_s = time.perf_counter() - t0
+
+	truth = [prios[i] for i in te]
+	t0 = time.perf_counter()
+	predicted = [p["priority"] for p in model.predict(embs[ids[te]])]
+	predict_ms = 1000.0 * (time.perf_counter() - t0)
+	report = {
+		"classes": classes, "train": int(len(tr)), "holdout": int(len(te)), "train_s": train_s,
+		"predict_ms_per_1k": predict_ms * 1000.0 / max(1, len(te)),
+		"model": scores(truth, predicted, classes),
+		"keyword_baseline": scores(truth, keyword_priority([texts[i] for i in te]), classes),
+		"majority_baseline": scores(truth, [max(classes, key=train_prios.count)] * len(te), classes),
+	}
+	print(f"Trained in {train_s:.1f}s; predicting {len(te)} tickets took {predict_ms:.1f} ms.")
+	for name in ("model", "keyword_baseline", "majority_baseline"):
+		print(f"  {name:<18} accuracy={report[name]['accuracy']:.4f}  macro-F1={report[name]['macro_f1']:.4f}")
+
+	model.save(out)
+	print(f"Saved {out}")
+	if args.report_out:
+		with open(args.report_out, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
@@ -1,45 +1,582 @@
-import os, json, tomli
-from fastapi import FastAPI
+import os, json, time, tomli, logging, asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 
-from .schemas import EnhanceRequest, EnhanceResponse
-from .rag import Retriever
-from .llm import render_prompt, generate
-from .jira_api import update_issue_description
+# keep this import list light: faiss, torch and transformers load in warm_start(),
+# and only the ones the configured encoder / PROVIDER actually need
+from .schemas import EnhanceRequest, EnhanceResponse, BatchEnhanceRequest, ReloadRequest, DuplicatesRequest, DuplicatesResponse
+from .llm import PROVIDER, agenerate, astream_generate, warm_up, huggingface_stats, model_id, count_tokens
+from .prompting import render_prompt, build_context, context_settings
+from .jira_api import aupdate_issue_description
+from .clients import aclose_all
+from .cache import ResponseCache, file_hash, namespace_key
+from .registry import UnknownAdapter
+from .metrics import StageTimer, PROMPT_TOKENS, record_cache, register_cache_stats
 
 
 load_dotenv()
 
 
-with open("config.toml", "rb") as f:
-	CFG = tomli.load(f)
+log = logging.getLogger(__name__)
+CFG = {}
+cache = None
+indexes = None
+priority_model = None
+startup = {"ready": False, "stages": {}, "error": None}
 
 
-retriever = Retriever(CFG)
-app = FastAPI(title="Defect Enhancer POC")
 
 
+def load_config(path: str = None):
+	with open(path or os.getenv("CONFIG_PATH", "config.toml"), "rb") as f:
+		return tomli.load(f)
 
 
-@app.post("/enhance", response_model=EnhanceResponse)
-def enhance(req: EnhanceRequest):
-	ctx = retriever.search(req.vague_text, k=req.top_k)
+
+
+async def stage(name: str, fn, *args):
+	t0 = time.perf_counter()
+	result = await run_in_threadpool(fn, *args)
+	startup["stages"][name] = round(time.perf_counter() - t0, 3)
+	return result
+
+
+
+
+def load_priority_model(cfg: dict):
+	from .priority import PriorityModel
+	path = cfg.get("priority", {}).get("model_path", "models/priority.npz")
+	if not PriorityModel.exists(path):
+		return None
+	model = PriorityModel.load(path)
+	embed_model = cfg.get("index", {}).get("embed_model")
+	if model.embed_model and embed_model and model.embed_model != embed_model:
+		log.warning("Ignoring %s: trained on %s embeddings, index uses %s", path, model.embed_model, embed_model)
+		return None
+	return model
+
+
+
+
+async def warm_start():
+	global indexes, priority_model
+	try:
+		# IndexManager brings in faiss and the query encoder backend
+		from .versions import IndexManager
+		indexes = await stage("index", IndexManager, CFG)
+		indexes.start()
+		priority_model = await stage("priority", load_priority_model, CFG)
+		# load the local model before the first request instead of on it
+		await stage("model", warm_up)
+		startup["ready"] = True
+	except Exception as e:
+		log.exception("Warm-up failed")
+		startup["error"] = str(e)
+
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	global CFG, cache
+	CFG = load_config()
+	cache = ResponseCache.from_config(CFG)
+	# the server accepts connections right away; /ready reports when warm-up is done
+	task = asyncio.create_task(warm_start())
+	yield
+	task.cancel()
+	if indexes is not None:
+		await indexes.stop()
+	if cache is not None:
+		await run_in_threadpool(cache.close)
+	await aclose_all()
+
+
+app = FastAPI(title="Defect Enhancer POC", lifespan=lifespan)
+register_cache_stats("query_embedding", lambda: indexes.retriever.encoder.stats() if indexes is not None else None)
+
+
+
+
+def live_indexes():
+	if indexes is None:
+		raise HTTPException(status_code=503, detail="Index is still loading; see /ready")
+	return indexes
+
+
+
+
+@app.get("/health")
+def health():
+	return {"status": "ok"}
+
+
+
+
+@app.get("/ready")
+def ready():
+	return JSONResponse(startup, status_code=200 if startup["ready"] else 503)
+
+
+
+
+@app.get("/metrics")
+def metrics():
+	from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+	return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+
+
+@app.get("/stats/huggingface")
+def hf_stats():
+	return huggingface_stats()
+
+
+
+
+@app.get("/stats/cache")
+def cache_stats():
+	return {
+		"responses": cache.stats() if cache is not None else {"enabled": False},
+		"query_embeddings": live_indexes().retriever.encoder.stats(),
+	}
+
+
+
+
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+
+
+def check_admin(request: Request, token):
+	expected = os.getenv("ADMIN_TOKEN")
+	if expected:
+		if token != expected:
+			raise HTTPException(status_code=403, detail="Invalid admin token")
+	elif request.client is None or request.client.host not in LOCAL_HOSTS:
+		# without a token only the machine the service runs on may use admin routes
+		raise HTTPException(status_code=403, detail="Admin routes are local-only unless ADMIN_TOKEN is set")
+
+
+
+
+@app.get("/admin/index")
+def index_status(request: Request, x_admin_token: Optional[str] = Header(None)):
+	check_admin(request, x_admin_token)
+	return live_indexes().status()
+
+
+
+
+@app.post("/admin/index/reload")
+async def index_reload(request: Request, body: ReloadRequest = ReloadRequest(), x_admin_token: Optional[str] = Header(None)):
+	"""
+	Load the version CURRENT points at now, or pin and load `version` (which must
+	exist under index/versions/). Searches keep using the old index until the new
+	one is fully loaded; one that fails to load is never swapped in or pinned.
+	`force` re-reads the live version, e.g. after scripts/find_duplicates.py
+	added duplicates.json to it.
+	"""
+	check_admin(request, x_admin_token)
+	indexes = live_indexes()
+	try:
+		if body.version:
+			changed = await run_in_threadpool(indexes.activate, body.version, body.force)
+		else:
+			changed = await run_in_threadpool(indexes.reload, None, body.force)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Index load failed: {e}")
+	return {"changed": changed, **indexes.status()}
+
+
+
+
+@app.post("/admin/index/rollback")
+async def index_rollback(request: Request, x_admin_token: Optional[str] = Header(None)):
+	check_admin(request, x_admin_token)
+	indexes = live_indexes()
+	try:
+		changed = await run_in_threadpool(indexes.rollback)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Index load failed: {e}")
+	return {"changed": changed, **indexes.status()}
+
+
+
+
+def duplicate_hits(retriever, metas, scores):
+	dups = retriever.duplicates
+	out, clusters = [], {}
+	for m, score in zip(metas, scores):
+		if m is None:
+			continue
+		m = dict(m)
+		m["score"] = score
+		m["cluster"] = None
+		if dups is not None:
+			c = dups.cluster_of.get(m.get("key"))
+			if c is not None:
+				m["cluster"] = c
+				clusters[str(c)] = dups.clusters[c]
+		out.append(m)
+	return out, clusters
+
+
+
+
+@app.post("/duplicates", response_model=DuplicatesResponse)
+async def duplicates(req: DuplicatesRequest):
+	"""
+	Existing tickets that look like this one. An indexed `issue_key` is answered
+	from the clusters in duplicates.json (scripts/find_duplicates.py) without a
+	search; new `text` is one vector search, hits at or above the threshold
+	tagged with their precomputed cluster.
+	"""
+	if not req.issue_key and not req.text:
+		raise HTTPException(status_code=400, detail="Give issue_key or text")
+	timer = StageTimer("duplicates")
+	retriever = live_indexes().retriever
+	dups = retriever.duplicates
+	if req.issue_key and dups is not None and (req.issue_key in dups or not req.text):
+		# pairs below the offline threshold were never stored, so it is the floor here
+		threshold = max(req.threshold or 0.0, dups.threshold)
+		with timer.stage("lookup"):
+			near = [(k, s) for k, s in dups.neighbors.get(req.issue_key, []) if s >= threshold][:req.top_k]
+			metas = retriever.fetch([dups.ids[k] for k, _ in near])
+			found, clusters = duplicate_hits(retriever, metas, [s for _, s in near])
+		source = "index"
+	elif req.text:
+		threshold = req.threshold if req.threshold is not None else (
+			dups.threshold if dups is not None else float(CFG.get("duplicates", {}).get("threshold", 0.9))
+		)
+		with timer.stage("search"):
+			hits = await run_in_threadpool(
+				retriever.search, req.text, k=req.top_k + 1, mode="vector", projects=req.search_projects
+			)
+		hits = [h for h in hits if h["score"] >= threshold and h.get("key") != req.issue_key][:req.top_k]
+		found, clusters = duplicate_hits(retriever, hits, [h["score"] for h in hits])
+		source = "search"
+	else:
+		raise HTTPException(
+			status_code=404, detail="No duplicates.json for this index version; run scripts/find_duplicates.py or send text"
+		)
+	timer.finish()
+	return DuplicatesResponse(source=source, threshold=threshold, duplicates=found, clusters=clusters)
+
+
+
+
+async def write_back(issue_key: str, description: str, endpoint: str = "enhance"):
+	try:
+		with StageTimer(endpoint).stage("jira"):
+			await aupdate_issue_description(issue_key, description)
+	except Exception:
+		log.exception("Failed to update Jira issue %s", issue_key)
+
+
+
+
+async def write_back_many(updates, concurrency: int):
+	sem = asyncio.Semaphore(concurrency)
+
+	async def one(issue_key, description):
+		async with sem:
+			await write_back(issue_key, description, "batch")
+
+	await asyncio.gather(*(one(k, d) for k, d in updates))
+
+
+
+
+def cache_namespace(req: EnhanceRequest) -> str:
+	# cached answers are only reused for the same template, project and generator
+	return namespace_key(
+		file_hash(CFG["prompt"]["template_path"]), req.project_key, model_id(), req.adapter or "", req.top_k,
+		req.retrieval_mode or indexes.retriever.default_mode, indexes.version or "", ",".join(search_projects(req))
+	)
+
+
+
+
+async def cache_call(fn, *args):
+	# a SQLite-backed cache commits to disk, which must not block the event loop
+	return await run_in_threadpool(fn, *args) if cache.persistent else fn(*args)
+
+
+
+
+async def cache_lookup(req: EnhanceRequest, q):
+	if cache is None or not req.use_cache:
+		return None
+	hit = await cache_call(cache.get, cache_namespace(req), q)
+	record_cache("response", hit is not None)
+	return hit
+
+
+
+
+async def cache_store(req: EnhanceRequest, q, enhanced: str, ctx):
+	if cache is not None and req.use_cache:
+		await cache_call(cache.put, cache_namespace(req), q, {"enhanced": enhanced, "context": ctx})
+
+
+
+
+def search_projects(req: EnhanceRequest):
+	return req.search_projects or [req.project_key]
+
+
+
+
+def fetch_k(req: EnhanceRequest) -> int:
+	# over-fetch so hits dropped as weak or duplicate can be backfilled up to top_k
+	return req.top_k * 2
+
+
+
+
+def prepare_context(req: EnhanceRequest, hits):
+	return build_context(hits, context_settings(CFG, PROVIDER), count_tokens, max_docs=req.top_k)
+
+
+
+
+def classify(Q, timer: StageTimer):
+	# one matmul over the query embeddings already computed for retrieval
+	if priority_model is None:
+		return [None] * len(Q)
+	with timer.stage("classify"):
+		return priority_model.predict(Q)
+
+
+
+
+def make_prompt(req: EnhanceRequest, ctx):
 	prompt = render_prompt(
 		CFG["prompt"]["template_path"],
 		vague_text=req.vague_text,
 		project_key=req.project_key,
 		context_docs=ctx
 	)
-	enhanced = generate(prompt)
+	PROMPT_TOKENS.labels(PROVIDER).observe(count_tokens(prompt))
+	return prompt
+
+
+
+
+async def build_prompt(req: EnhanceRequest, q, retriever, timer: StageTimer):
+	# FAISS / BM25 search is CPU-bound; keep it off the event loop
+	with timer.stage("search"):
+		hits = await run_in_threadpool(
+			retriever.search, req.vague_text, k=fetch_k(req), mode=req.retrieval_mode, q=q, projects=search_projects(req)
+		)
+	with timer.stage("render"):
+		ctx = prepare_context(req, hits)
+		prompt = make_prompt(req, ctx)
+	return ctx, prompt
+
+
+
+
+@app.post("/enhance", response_model=EnhanceResponse)
+async def enhance(req: EnhanceRequest, background: BackgroundTasks):
+	timer = StageTimer("enhance")
+	# one Retriever per request: a reload swaps indexes.retriever, not this reference
+	retriever = live_indexes().retriever
+	with timer.stage("encode"):
+		q = await run_in_threadpool(retriever.encode, req.vague_text)
+	priority = classify(q[None, :], timer)[0]
+	hit = await cache_lookup(req, q)
+	if hit is not None:
+		enhanced, ctx = hit["enhanced"], hit["context"]
+	else:
+		ctx, prompt = await build_prompt(req, q, retriever, timer)
+		try:
+			with timer.stage("generate"):
+				enhanced = await agenerate(prompt, adapter=req.adapter)
+		except UnknownAdapter as e:
+			raise HTTPException(status_code=400, detail=str(e))
+		except (json.JSONDecodeError, KeyError) as e:
+			# JSONDecodeError is a ValueError too, but a garbled provider reply is not the client's fault
+			raise HTTPException(status_code=502, detail=f"Malformed response from {PROVIDER}: {e!r}")
+		await cache_store(req, q, enhanced, ctx)
 
 	updated_key = None
 	if req.update_jira and req.issue_key:
+		# the Jira write-back runs after the response is sent; failures are logged
+		background.add_task(write_back, req.issue_key, enhanced)
+		updated_key = req.issue_key
+
+	timings = timer.finish()
+	return EnhanceResponse(
+		enhanced=enhanced, context=ctx, updated_issue_key=updated_key, cached=hit is not None,
+		timings=timings if req.include_timings else None, priority=priority
+	)
+
+
+
+
+def sse(event: str, data) -> str:
+	return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+
+
+@app.post("/enhance/stream")
+async def enhance_stream(req: EnhanceRequest):
+	"""
+	Server-sent events: one `context` event with the retrieved docs, a `token`
+	event per generated chunk, then `done` (with the full text) or `error`.
+	"""
+	timer = StageTimer("stream")
+	retriever = live_indexes().retriever
+	with timer.stage("encode"):
+		q = await run_in_threadpool(retriever.encode, req.vague_text)
+	priority = classify(q[None, :], timer)[0]
+	hit = await cache_lookup(req, q)
+	if hit is None:
+		ctx, prompt = await build_prompt(req, q, retriever, timer)
+	else:
+		ctx = hit["context"]
+
+	async def events():
+		yield sse("context", ctx)
+		if hit is not None:
+			parts = [hit["enhanced"]]
+			yield sse("token", hit["enhanced"])
+		else:
+			parts = []
+			t0 = time.perf_counter()
+			try:
+				async for token in astream_generate(prompt, adapter=req.adapter):
+					if not parts:
+						timer.observe("first_token", time.perf_counter() - t0)
+					parts.append(token)
+					yield sse("token", token)
+			except Exception as e:
+				yield sse("error", str(e))
+				return
+			timer.observe("generate", time.perf_counter() - t0)
+		enhanced = "".join(parts).strip()
+		if hit is None:
+			await cache_store(req, q, enhanced, ctx)
+		update = bool(req.update_jira and req.issue_key)
+		done = {
+			"enhanced": enhanced, "updated_issue_key": req.issue_key if update else None, "cached": hit is not None,
+			"priority": priority,
+		}
+		timings = timer.finish()
+		if req.include_timings:
+			done["timings"] = timings
+		yield sse("done", done)
+		if update:
+			await write_back(req.issue_key, enhanced, "stream")
+
+	return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+
+
+@app.post("/enhance/batch")
+async def enhance_batch(batch: BatchEnhanceRequest):
+	"""
+	Enhance many tickets in one call. All queries are embedded in one batched
+	encode and searched with one multi-row FAISS search; generation fans out with
+	at most `concurrency` LLM calls in flight. Results stream back as JSONL in
+	completion order, one line per item with its `index` and either `result` or
+	`error`. Jira write-backs run together after the last line is sent.
+	"""
+	items = batch.items
+	max_items = int(CFG.get("batch", {}).get("max_items", 1000))
+	if len(items) > max_items:
+		raise HTTPException(status_code=413, detail=f"At most {max_items} items per batch")
+	if not items:
+		return StreamingResponse(iter(()), media_type="application/x-ndjson")
+
+	# encode / search are shared by the whole batch; render / generate are per item
+	timer = StageTimer("batch")
+	retriever = live_indexes().retriever
+	with timer.stage("encode"):
+		Q = await run_in_threadpool(retriever.encode_batch, [r.vague_text for r in items])
+	priorities = classify(Q, timer)
+	hits = [await cache_lookup(r, q) for r, q in zip(items, Q)]
+	todo = [i for i, h in enumerate(hits) if h is None]
+	try:
+		with timer.stage("search"):
+			ctxs = await run_in_threadpool(
+				retriever.search_batch,
+				[items[i].vague_text for i in todo],
+				k=[fetch_k(items[i]) for i in todo],
+				modes=[items[i].retrieval_mode for i in todo],
+				projects=[search_projects(items[i]) for i in todo],
+				Q=Q[todo],
+			) if todo else []
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+
+	sem = asyncio.Semaphore(batch.concurrency)
+	updates = []
+
+	async def run(i, ctx):
+		req = items[i]
+		item_timer = StageTimer("batch")
 		try:
-			update_issue_description(req.issue_key, enhanced)
-			updated_key = req.issue_key
+			with item_timer.stage("render"):
+				ctx = prepare_context(req, ctx)
+				prompt = make_prompt(req, ctx)
+			async with sem:
+				with item_timer.stage("generate"):
+					enhanced = await agenerate(prompt, adapter=req.adapter)
 		except Exception as e:
-			enhanced += f"\n\n[Note: Failed to update Jira: {e}]"
+			return i, None, ctx, e, False, None
+		await cache_store(req, Q[i], enhanced, ctx)
+		return i, enhanced, ctx, None, False, {**timer.timings, **item_timer.timings}
+
+	def line(i, enhanced, ctx, err, cached=False, timings=None):
+		req = items[i]
+		out = {"index": i, "issue_key": req.issue_key}
+		if err is not None:
+			out["error"] = str(err)
+		else:
+			update = bool(req.update_jira and req.issue_key)
+			if update:
+				updates.append((req.issue_key, enhanced))
+			resp = EnhanceResponse(
+				enhanced=enhanced, context=ctx, updated_issue_key=req.issue_key if update else None, cached=cached,
+				timings=(timings or dict(timer.timings)) if req.include_timings else None, priority=priorities[i]
+			)
+			out["result"] = resp.model_dump()
+		return json.dumps(out, ensure_ascii=False) + "\n"
+
+	async def lines():
+		for i, h in enumerate(hits):
+			if h is not None:
+				yield line(i, h["enhanced"], h["context"], None, cached=True)
+		tasks = [asyncio.ensure_future(run(i, ctx)) for i, ctx in zip(todo, ctxs)]
+		try:
+			for fut in asyncio.as_completed(tasks):
+				yield line(*(await fut))
+		finally:
+			for t in tasks:
+				t.cancel()
+			timer.finish()
 
-	return EnhanceResponse(enhanced=enhanced, context=ctx, updated_issue_key=updated_key)
\ No newline at end of file
+	jira_concurrency = int(CFG.get("batch", {}).get("jira_concurrency", 4))
+	return StreamingResponse(
+		lines(),
+		media_type="application/x-ndjson",
+		background=BackgroundTask(write_back_many, updates, jira_concurrency),
+	)
\ No newline at end of file
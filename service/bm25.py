@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import shutil
+from collections import Counter
+import numpy as np
+
+
+"""
+Inverted-index BM25 over ticket summary + description.
+
+Stored as a directory of .npy arrays (postings sorted by term) plus vocab.json,
+loaded memory-mapped. Doc ids are the same vector ids the FAISS index uses.
+"""
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[_.\-/:][a-z0-9]+)*")
+
+
+
+
+def tokenize(text: str):
+	# keep compound tokens like "err-1042" or "order.book" and also index their parts
+	out = []
+	for tok in TOKEN_RE.findall((text or "").lower()):
+		out.append(tok)
+		parts = re.split(r"[_.\-/:]", tok)
+		if len(parts) > 1:
+			out.extend(p for p in parts if p)
+	return out
+
+
+
+
+class BM25Index:
+	def __init__(self, vocab, offsets, post_ids, post_tfs, doc_len, k1=1.2, b=0.75):
+		self.vocab = vocab
+		self.offsets = offsets
+		self.post_ids = post_ids
+		self.post_tfs = post_tfs
+		self.doc_len = doc_len
+		self.k1 = k1
+		self.b = b
+		live = doc_len > 0
+		self.n_docs = int(live.sum())
+		self.avgdl = float(doc_len[live].mean()) if self.n_docs else 0.0
+
+	@classmethod
+	def build(cls, docs, **kw):
+		"""docs: iterable of (doc_id, text)."""
+		postings = {}
+		lengths = {}
+		for doc_id, text in docs:
+			toks = tokenize(text)
+			lengths[doc_id] = len(toks)
+			for term, tf in Counter(toks).items():
+				postings.setdefault(term, []).append((doc_id, tf))
+		terms = sorted(postings)
+		offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+		for i, t in enumerate(terms):
+			offsets[i + 1] = offsets[i] + len(postings[t])
+		post_ids = np.empty(int(offsets[-1]), dtype=np.int64)
+		post_tfs = np.empty(int(offsets[-1]), dtype=np.float32)
+		for i, t in enumerate(terms):
+			ids, tfs = zip(*postings[t])
+			post_ids[offsets[i]:offsets[i + 1]] = ids
+			post_tfs[offsets[i]:offsets[i + 1]] = tfs
+		doc_len = np.zeros((max(lengths) + 1) if lengths else 0, dtype=np.float32)
+		for doc_id, n in lengths.items():
+			doc_len[doc_id] = n
+		return cls({t: i for i, t in enumerate(terms)}, offsets, post_ids, post_tfs, doc_len, **kw)
+
+	@staticmethod
+	def exists(path: str) -> bool:
+		return os.path.exists(os.path.join(path, "vocab.json"))
+
+	@classmethod
+	def load(cls, path: str, **kw):
+		with open(os.path.join(path, "vocab.json"), "r", encoding="utf-8") as f:
+			vocab = {t: i for i, t in enumerate(json.load(f))}
+		arr = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+		return cls(vocab, arr("offsets"), arr("post_ids"), arr("post_tfs"), np.asarray(arr("doc_len")), **kw)
+
+	def save(self, path: str):
+		# build in a sibling dir and swap it in, so readers with the old arrays mapped keep working
+		tmp = path.rstrip("/\\") + ".tmp"
+		shutil.rmtree(tmp, ignore_errors=True)
+		os.makedirs(tmp)
+		for name in ("offsets", "post_ids", "post_tfs", "doc_len"):
+			np.save(os.path.join(tmp, f"{name}.npy"), getattr(self, name))
+		with open(os.path.join(tmp, "vocab.json"), "w", encoding="utf-8") as f:
+			json.dump(sorted(self.vocab, key=self.vocab.get), f, ensure_ascii=False)
+		old = path.rstrip("/\\") + ".old"
+		shutil.rmtree(old, ignore_errors=True)
+		if os.path.exists(path):
+			os.rename(path, old)
+		os.rename(tmp, path)
+		shutil.rmtree(old, ignore_errors=True)
+
+	def search(self, query: str, k: int = 10, within=None):
+		"""
+		Returns (scores, ids), best first; only docs matching at least one term.
+		`within` (an array of doc ids) restricts the ranking to those docs.
+		"""
+		scores = np.zeros(len(self.doc_len), dtype=np.float32)
+		matched = False
+		for term in set(tokenize(query)):
+			t = self.vocab.get(term)
+			if t is None:
+				continue
+			lo, hi = int(self.offsets[t]), int(self.offsets[t + 1])
+			ids = np.asarray(self.post_ids[lo:hi])
+			tfs = np.asarray(self.post_tfs[lo:hi])
+			idf = np.log(1.0 + (self.n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+			norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[ids] / self.avgdl)
+			scores[ids] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+			matched = True
+		if not matched:
+			return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+		if within is None:
+			nz = np.flatnonzero(scores)
+		else:
+			within = np.asarray(within, dtype=np.int64)
+			nz = within[scores[within] > 0]
+		if len(nz) > k:
+			nz = nz[np.argpartition(-scores[nz], k)[:k]]
+		top = nz[np.argsort(-scores[nz], kind="stable")]
+		return scores[top], top.astype(np.int64)
+
+
+
+
+def rrf_fuse(rankings, k: int = 10, c: int = 60):
+	"""
+	Reciprocal-rank fusion: each ranked list of ids contributes 1 / (c + rank).
+	Returns [(id, fused_score)] best first.
+	"""
+	fused = {}
+	for ranked in rankings:
+		for rank, doc_id in enumerate(ranked):
+			fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (c + rank + 1)
+	return sorted(fused.items(), key=lambda x: -x[1])[:k]
\ No newline at end of file
@@ -0,0 +1,216 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+"""
+Response cache for /enhance, keyed on the normalized query embedding plus a
+namespace (prompt template hash, project key, provider/model). "exact" mode only
+matches identical embeddings; "semantic" mode also returns the closest cached
+entry in the namespace whose cosine similarity clears the threshold.
+Entries expire after ttl_seconds and are evicted LRU beyond max_entries.
+With sqlite_path set, entries are written through to SQLite and reloaded on start.
+Each put() is one transaction; the last_used bumps from hits are batched and
+written with the next put, or after touch_flush_seconds, or on close(). The
+service calls a persistent cache from the threadpool, never on the event loop.
+"""
+
+
+
+
+def file_hash(path: str) -> str:
+	with open(path, "rb") as f:
+		return hashlib.sha1(f.read()).hexdigest()[:16]
+
+
+
+
+def namespace_key(*parts) -> str:
+	return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+
+
+def _emb_key(namespace: str, emb: np.ndarray) -> str:
+	return hashlib.sha1(namespace.encode("utf-8") + np.ascontiguousarray(emb, dtype=np.float32).tobytes()).hexdigest()
+
+
+
+
+class _Entry:
+	__slots__ = ("namespace", "emb", "value", "expires")
+
+	def __init__(self, namespace, emb, value, expires):
+		self.namespace = namespace
+		self.emb = emb
+		self.value = value
+		self.expires = expires
+
+
+
+
+class ResponseCache:
+	def __init__(self, mode: str = "semantic", similarity_threshold: float = 0.95, ttl_seconds: float = 86400,
+			max_entries: int = 2048, sqlite_path: str = None, touch_flush_seconds: float = 30.0):
+		if mode not in ("exact", "semantic"):
+			raise ValueError(f"Unknown cache mode: {mode}")
+		self.mode = mode
+		self.threshold = float(similarity_threshold)
+		self.ttl = float(ttl_seconds)
+		self.max_entries = int(max_entries)
+		self._entries = OrderedDict()
+		self._by_ns = {}
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.near_hits = 0
+		self.misses = 0
+		self.touch_flush = float(touch_flush_seconds)
+		self._touched = {}
+		self._flushed_at = time.time()
+		self._db = None
+		if sqlite_path:
+			self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+			self._db.execute(
+				"CREATE TABLE IF NOT EXISTS responses ("
+				"key TEXT PRIMARY KEY, namespace TEXT, emb BLOB, value TEXT, expires REAL, last_used REAL)"
+			)
+			self._db.commit()
+			self._load()
+
+	@classmethod
+	def from_config(cls, cfg: dict):
+		c = cfg.get("cache", {})
+		if not c.get("enabled", False):
+			return None
+		return cls(
+			mode=c.get("mode", "semantic"),
+			similarity_threshold=c.get("similarity_threshold", 0.95),
+			ttl_seconds=c.get("ttl_seconds", 86400),
+			max_entries=c.get("max_entries", 2048),
+			sqlite_path=c.get("sqlite_path") or None,
+			touch_flush_seconds=c.get("touch_flush_seconds", 30.0),
+		)
+
+	@property
+	def persistent(self) -> bool:
+		return self._db is not None
+
+	def get(self, namespace: str, emb: np.ndarray):
+		emb = np.asarray(emb, dtype=np.float32).ravel()
+		now = time.time()
+		with self._lock:
+			key = _emb_key(namespace, emb)
+			entry = self._entries.get(key)
+			if entry is not None and entry.expires < now:
+				self._drop(key)
+				self._commit(now)
+				entry = None
+			if entry is None and self.mode == "semantic":
+				key, entry = self._nearest(namespace, emb, now)
+				if entry is not None:
+					self.near_hits += 1
+			if entry is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self._entries.move_to_end(key)
+			if self._db is not None:
+				self._touched[key] = now
+				if now - self._flushed_at >= self.touch_flush:
+					self._commit(now)
+			return entry.value
+
+	def put(self, namespace: str, emb: np.ndarray, value: dict):
+		emb = np.asarray(emb, dtype=np.float32).ravel()
+		now = time.time()
+		with self._lock:
+			key = _emb_key(namespace, emb)
+			self._insert(key, _Entry(namespace, emb, value, now + self.ttl))
+			if self._db is not None:
+				self._db.execute(
+					"INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+					(key, namespace, emb.tobytes(), json.dumps(value, ensure_ascii=False), now + self.ttl, now),
+				)
+			self._evict(now)
+			self._commit(now)
+
+	def close(self):
+		with self._lock:
+			if self._db is not None:
+				self._commit(time.time())
+				self._db.close()
+				self._db = None
+
+	def stats(self) -> dict:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"mode": self.mode,
+				"entries": len(self._entries),
+				"hits": self.hits,
+				"near_hits": self.near_hits,
+				"misses": self.misses,
+				"hit_rate": (self.hits / lookups) if lookups else 0.0,
+				"persistent": self._db is not None,
+			}
+
+	def _nearest(self, namespace, emb, now):
+		keys = [k for k in self._by_ns.get(namespace, ()) if self._entries[k].expires >= now]
+		if not keys:
+			return None, None
+		mat = np.stack([self._entries[k].emb for k in keys])
+		sims = mat @ emb
+		best = int(np.argmax(sims))
+		if sims[best] < self.threshold:
+			return None, None
+		return keys[best], self._entries[keys[best]]
+
+	def _insert(self, key, entry):
+		if key in self._entries:
+			self._drop(key, persist=False)
+		self._entries[key] = entry
+		self._by_ns.setdefault(entry.namespace, set()).add(key)
+
+	def _drop(self, key, persist=True):
+		entry = self._entries.pop(key)
+		keys = self._by_ns.get(entry.namespace)
+		if keys is not None:
+			keys.discard(key)
+			if not keys:
+				del self._by_ns[entry.namespace]
+		self._touched.pop(key, None)
+		if persist and self._db is not None:
+			self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+	def _evict(self, now):
+		expired = [k for k, e in self._entries.items() if e.expires < now]
+		for k in expired:
+			self._drop(k)
+		while len(self._entries) > self.max_entries:
+			self._drop(next(iter(self._entries)))
+
+	def _commit(self, now):
+		# one transaction for pending touches plus whatever the caller already executed
+		if self._db is None:
+			return
+		if self._touched:
+			self._db.executemany("UPDATE responses SET last_used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+			self._touched.clear()
+		self._db.commit()
+		self._flushed_at = now
+
+	def _load(self):
+		now = time.time()
+		self._db.execute("DELETE FROM responses WHERE expires < ?", (now,))
+		self._db.commit()
+		rows = self._db.execute(
+			"SELECT key, namespace, emb, value, expires FROM responses ORDER BY last_used DESC LIMIT ?",
+			(self.max_entries,),
+		).fetchall()
+		# oldest first so the OrderedDict keeps LRU order
+		for key, ns, emb, value, expires in reversed(rows):
+			self._insert(key, _Entry(ns, np.frombuffer(emb, dtype=np.float32), json.loads(value), expires))
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+"""
+Shared keep-alive HTTP connection pools, one per upstream (openai, ollama, jira).
+Limits and timeouts come from the HTTP_* environment variables.
+"""
+
+
+_async_clients = {}
+_sessions = {}
+_lock = threading.Lock()
+
+
+
+
+def _env_float(name, default):
+	return float(os.getenv(name, str(default)))
+
+
+
+
+def pool_limits() -> httpx.Limits:
+	return httpx.Limits(
+		max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+		max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+		keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 30),
+	)
+
+
+
+
+def pool_timeout() -> httpx.Timeout:
+	return httpx.Timeout(
+		connect=_env_float("HTTP_CONNECT_TIMEOUT", 5),
+		read=_env_float("HTTP_READ_TIMEOUT", 120),
+		write=_env_float("HTTP_WRITE_TIMEOUT", 30),
+		pool=_env_float("HTTP_POOL_TIMEOUT", 30),
+	)
+
+
+
+
+def get_async_client(name: str) -> httpx.AsyncClient:
+	with _lock:
+		client = _async_clients.get(name)
+		if client is None or client.is_closed:
+			client = _async_clients[name] = httpx.AsyncClient(limits=pool_limits(), timeout=pool_timeout())
+		return client
+
+
+
+
+def get_session(name: str) -> requests.Session:
+	with _lock:
+		s = _sessions.get(name)
+		if s is None:
+			s = requests.Session()
+			size = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+			adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+			s.mount("http://", adapter)
+			s.mount("https://", adapter)
+			_sessions[name] = s
+		return s
+
+
+
+
+def request_timeout():
+	# (connect, read) tuple for the sync requests sessions
+	return (_env_float("HTTP_CONNECT_TIMEOUT", 5), _env_float("HTTP_READ_TIMEOUT", 120))
+
+
+
+
+async def aclose_all():
+	with _lock:
+		clients = list(_async_clients.values())
+		_async_clients.clear()
+		sessions = list(_sessions.values())
+		_sessions.clear()
+	for c in clients:
+		await c.aclose()
+	for s in sessions:
+		s.close()
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+
+
+"""
+CPU count for default worker / thread settings of the offline scripts.
+"""
+
+
+
+
+def usable_cpus() -> int:
+	# the affinity mask (Linux only) respects taskset / cgroup pinning; os.cpu_count() elsewhere
+	if hasattr(os, "sched_getaffinity"):
+		return len(os.sched_getaffinity(0))
+	return os.cpu_count() or 1
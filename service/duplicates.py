@@ -0,0 +1,162 @@
+import os
+import json
+import numpy as np
+
+
+"""
+Near-duplicate tickets, found offline and looked up online.
+
+find_duplicates() compares every pair of live vectors in embeddings.npy a
+block of rows at a time: each block is multiplied against itself and every
+later block, so memory stays at block x block scores and the N x N matrix is
+never built. Each ticket keeps its closest matches at or above the cosine
+threshold, those links are joined into clusters (connected components) and
+the result is written next to the index:
+
+  duplicates.json  {"threshold", "docs", "pairs",
+                    "clusters": [[key, ...], ...],       largest first
+                    "ids": {key: vector_id},             every clustered ticket
+                    "neighbors": {key: [[key, score], ...]}}   best first
+
+DuplicateIndex serves /duplicates from that file: an indexed ticket's
+duplicates are a dict lookup, and new text is one vector search whose hits
+are mapped to their clusters.
+"""
+
+
+
+
+def duplicate_settings(cfg: dict) -> dict:
+	d = cfg.get("duplicates", {})
+	return {
+		"threshold": float(d.get("threshold", 0.9)),
+		"block": int(d.get("block", 4096)),
+		"max_neighbors": int(d.get("max_neighbors", 10)),
+	}
+
+
+
+
+def score_blocks(embs, ids, block: int = 4096, progress=None):
+	"""
+	Yields (a, b, S) for every pair of row blocks a <= b, S = cosine scores of
+	embs[ids[a:a+block]] against embs[ids[b:b+block]]. `embs` is row-normalized
+	and may be a memmap. `progress(done, total)` is called after each row block.
+	"""
+	n = len(ids)
+	for a in range(0, n, block):
+		A = np.ascontiguousarray(embs[ids[a:a + block]], dtype=np.float32)
+		for b in range(a, n, block):
+			B = A if b == a else np.ascontiguousarray(embs[ids[b:b + block]], dtype=np.float32)
+			yield a, b, A @ B.T
+		if progress is not None:
+			progress(min(a + block, n), n)
+
+
+
+
+def _merge_top(best_s, best_j, row0: int, S, col0: int):
+	# fold each row's best candidates from S into its running top-m
+	m = best_s.shape[1]
+	rows = slice(row0, row0 + S.shape[0])
+	kk = min(m, S.shape[1])
+	top = np.argpartition(-S, kk - 1, axis=1)[:, :kk]
+	s = np.concatenate([best_s[rows], np.take_along_axis(S, top, 1)], axis=1)
+	j = np.concatenate([best_j[rows], top + col0], axis=1)
+	keep = np.argpartition(-s, m - 1, axis=1)[:, :m]
+	best_s[rows] = np.take_along_axis(s, keep, 1)
+	best_j[rows] = np.take_along_axis(j, keep, 1)
+
+
+
+
+def _find(parent, i):
+	while parent[i] != i:
+		parent[i] = parent[parent[i]]
+		i = parent[i]
+	return i
+
+
+
+
+def find_duplicates(embs, ids, keys, threshold: float = 0.9, block: int = 4096, max_neighbors: int = 10, progress=None):
+	"""
+	ids: live vector ids, keys: their ticket keys (same order). Returns the
+	duplicates.json payload. Each ticket keeps its max_neighbors closest
+	duplicates, and clusters are the connected components of those links.
+	"""
+	ids = np.asarray(ids, dtype=np.int64)
+	n = len(ids)
+	best_s = np.full((n, max_neighbors), -np.inf, dtype=np.float32)
+	best_j = np.full((n, max_neighbors), -1, dtype=np.int64)
+	n_pairs = 0
+	for a, b, S in score_blocks(embs, ids, block, progress):
+		hit = S >= threshold
+		if a == b:
+			np.fill_diagonal(hit, False)
+			n_pairs += int(np.count_nonzero(hit)) // 2
+		else:
+			n_pairs += int(np.count_nonzero(hit))
+		if not hit.any():
+			continue
+		S[~hit] = -np.inf
+		_merge_top(best_s, best_j, a, S, b)
+		if b != a:
+			_merge_top(best_s, best_j, b, S.T, a)
+
+	rows, slots = np.nonzero(best_s > -np.inf)
+	parent = {}
+	for i, j in zip(rows.tolist(), best_j[rows, slots].tolist()):
+		parent.setdefault(i, i)
+		parent.setdefault(j, j)
+		ri, rj = _find(parent, i), _find(parent, j)
+		if ri != rj:
+			parent[max(ri, rj)] = min(ri, rj)
+
+	members = {}
+	for i in parent:
+		members.setdefault(_find(parent, i), []).append(i)
+	clusters = sorted((sorted(m) for m in members.values()), key=lambda m: (-len(m), m[0]))
+	neighbors = {}
+	for i in sorted(set(rows.tolist())):
+		order = np.argsort(-best_s[i])
+		neighbors[keys[i]] = [
+			[keys[int(best_j[i, o])], round(float(best_s[i, o]), 4)] for o in order if best_s[i, o] > -np.inf
+		]
+	return {
+		"threshold": float(threshold),
+		"docs": int(n),
+		"pairs": int(n_pairs),
+		"clusters": [[keys[i] for i in m] for m in clusters],
+		"ids": {keys[i]: int(ids[i]) for i in parent},
+		"neighbors": neighbors,
+	}
+
+
+
+
+def save_duplicates(path: str, payload: dict):
+	tmp = path + ".tmp"
+	with open(tmp, "w", encoding="utf-8") as f:
+		json.dump(payload, f, ensure_ascii=False)
+	os.replace(tmp, path)
+
+
+
+
+class DuplicateIndex:
+	def __init__(self, path: str):
+		with open(path, "r", encoding="utf-8") as f:
+			data = json.load(f)
+		self.threshold = float(data["threshold"])
+		self.clusters = data["clusters"]
+		self.ids = data["ids"]
+		self.neighbors = data["neighbors"]
+		self.cluster_of = {key: c for c, keys in enumerate(self.clusters) for key in keys}
+
+	@staticmethod
+	def exists(path: str) -> bool:
+		return os.path.exists(path)
+
+	def __contains__(self, key: str) -> bool:
+		return key in self.cluster_of
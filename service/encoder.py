@@ -0,0 +1,131 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+"""
+Query encoders for the Retriever. All backends return L2-normalized float32 rows.
+
+  torch     - the SentenceTransformer model as-is
+  quantized - same model with nn.Linear layers dynamically quantized to int8 (CPU)
+  onnx      - an exported ONNX graph run by onnxruntime (see scripts/export_onnx_encoder.py)
+
+QueryEncoder adds an LRU cache of embeddings keyed by query text in front of
+any backend.
+"""
+
+
+
+
+def _normalize(x):
+	x = np.asarray(x, dtype=np.float32)
+	return x / np.clip(np.linalg.norm(x, axis=1, keepdims=True), 1e-12, None)
+
+
+
+
+class TorchBackend:
+	def __init__(self, model_name: str, quantize: bool = False):
+		from sentence_transformers import SentenceTransformer
+		self.model = SentenceTransformer(model_name, device="cpu" if quantize else None)
+		if quantize:
+			import torch
+			self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+	def encode(self, texts) -> np.ndarray:
+		return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True, batch_size=64)
+
+	def dim(self) -> int:
+		return self.model.get_sentence_embedding_dimension()
+
+
+
+
+class OnnxBackend:
+	def __init__(self, path: str, threads: int = 0):
+		import onnxruntime as ort
+		from transformers import AutoTokenizer
+		self.tokenizer = AutoTokenizer.from_pretrained(path)
+		opts = ort.SessionOptions()
+		if threads:
+			opts.intra_op_num_threads = threads
+		self.session = ort.InferenceSession(os.path.join(path, "model.onnx"), opts, providers=["CPUExecutionProvider"])
+		self.input_names = {i.name for i in self.session.get_inputs()}
+
+	def encode(self, texts) -> np.ndarray:
+		enc = self.tokenizer(list(texts), padding=True, truncation=True, max_length=256, return_tensors="np")
+		feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+		hidden = self.session.run(None, feeds)[0]
+		# mean pooling over real tokens, as the sentence-transformers Pooling layer does
+		mask = enc["attention_mask"][..., None].astype(np.float32)
+		return _normalize((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+
+	def dim(self) -> int:
+		return int(self.session.get_outputs()[0].shape[-1])
+
+
+
+
+def load_backend(params: dict):
+	kind = params.get("encoder_backend", "torch")
+	model_name = params.get("embed_model", "sentence-transformers/all-MiniLM-L6-v2")
+	if kind == "torch":
+		return TorchBackend(model_name)
+	if kind == "quantized":
+		return TorchBackend(model_name, quantize=True)
+	if kind == "onnx":
+		return OnnxBackend(params.get("onnx_path", "models/encoder-onnx"), threads=int(params.get("onnx_threads", 0)))
+	raise ValueError(f"Unknown encoder backend: {kind}")
+
+
+
+
+class QueryEncoder:
+	def __init__(self, backend, cache_size: int = 4096):
+		self.backend = backend
+		self.cache_size = int(cache_size)
+		self._cache = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def encode(self, texts) -> np.ndarray:
+		texts = list(texts)
+		out = [None] * len(texts)
+		missing = {}
+		with self._lock:
+			for i, t in enumerate(texts):
+				v = self._cache.get(t)
+				if v is None:
+					missing.setdefault(t, []).append(i)
+				else:
+					self._cache.move_to_end(t)
+					out[i] = v
+			self.hits += len(texts) - sum(len(v) for v in missing.values())
+			self.misses += sum(len(v) for v in missing.values())
+		if missing:
+			uniq = list(missing)
+			embs = np.asarray(self.backend.encode(uniq), dtype=np.float32)
+			with self._lock:
+				for t, v in zip(uniq, embs):
+					v.flags.writeable = False
+					for i in missing[t]:
+						out[i] = v
+					if self.cache_size:
+						self._cache[t] = v
+						self._cache.move_to_end(t)
+				while len(self._cache) > self.cache_size:
+					self._cache.popitem(last=False)
+		return np.stack(out) if out else np.empty((0, self.backend.dim()), dtype=np.float32)
+
+	def stats(self) -> dict:
+		with self._lock:
+			total = self.hits + self.misses
+			return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / total) if total else 0.0}
+
+
+
+
+def build_encoder(params: dict) -> QueryEncoder:
+	return QueryEncoder(load_backend(params), cache_size=int(params.get("query_cache_size", 4096)))
\ No newline at end of file
@@ -0,0 +1,63 @@
+import re
+
+
+"""
+Query expansion for the "multi_query" retrieval mode.
+
+A short, vague defect ("payment error") is turned into a few variants: the
+original, template rewrites and synonym swaps from [retrieval.synonyms]. The
+Retriever encodes them in one batch, searches them as one multi-row FAISS
+query and fuses the ranked lists with reciprocal-rank fusion.
+"""
+
+
+DEFAULT_TEMPLATES = [
+	"{q}",
+	"{q} error in production",
+	"{q} is not working as expected",
+	"{keywords}",
+]
+
+STOPWORDS = {
+	"a", "an", "the", "is", "are", "was", "were", "be", "it", "its", "this", "that", "to", "of", "in", "on",
+	"for", "with", "and", "or", "not", "no", "but", "at", "by", "from", "as", "when", "after", "sometimes",
+	"some", "any", "my", "our", "we", "i", "me", "does", "doesnt", "dont", "can", "cant", "cannot", "get",
+	"got", "getting", "issue", "problem", "bug", "please",
+}
+WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.\-/]*")
+
+
+
+
+class QueryExpander:
+	def __init__(self, templates=None, synonyms=None, max_variants: int = 4):
+		self.templates = list(templates or DEFAULT_TEMPLATES)
+		self.synonyms = {k.lower(): list(v) for k, v in (synonyms or {}).items()}
+		self.max_variants = max(1, int(max_variants))
+
+	@classmethod
+	def from_config(cls, cfg: dict):
+		r = cfg.get("retrieval", {})
+		return cls(r.get("expansion_templates"), r.get("synonyms"), r.get("expansion_variants", 4))
+
+	def keywords(self, text: str) -> str:
+		return " ".join(w for w in WORD_RE.findall(text) if w.lower() not in STOPWORDS)
+
+	def expand(self, text: str):
+		"""Distinct variants, original first, at most max_variants."""
+		q = " ".join(text.split())
+		out = [q]
+		words = q.split()
+		# synonym swaps first: they add vocabulary, templates mostly add framing
+		for i, w in enumerate(words):
+			for syn in self.synonyms.get(w.lower(), []):
+				out.append(" ".join(words[:i] + [syn] + words[i + 1:]))
+		kw = self.keywords(q)
+		for t in self.templates:
+			out.append(t.format(q=q, keywords=kw).strip())
+		seen, variants = set(), []
+		for v in out:
+			if v and v.lower() not in seen:
+				seen.add(v.lower())
+				variants.append(v)
+		return variants[:self.max_variants]
@@ -1,7 +1,8 @@
 import os
-import requests
 from dotenv import load_dotenv
 
+from .clients import get_async_client, get_session, request_timeout
+
 
 load_dotenv()
 
@@ -20,6 +21,16 @@ AUTH = (EMAIL, TOKEN)
 def update_issue_description(issue_key: str, description: str):
 	url = f"{BASE}/rest/api/3/issue/{issue_key}"
 	payload = {"fields": {"description": description}}
-	r = requests.put(url, headers=HEADERS, auth=AUTH, json=payload)
+	r = get_session("jira").put(url, headers=HEADERS, auth=AUTH, json=payload, timeout=request_timeout())
+	r.raise_for_status()
+	return True
+
+
+
+
+async def aupdate_issue_description(issue_key: str, description: str):
+	url = f"{BASE}/rest/api/3/issue/{issue_key}"
+	payload = {"fields": {"description": description}}
+	r = await get_async_client("jira").put(url, headers=HEADERS, auth=AUTH, json=payload)
 	r.raise_for_status()
 	return True
\ No newline at end of file
@@ -1,63 +1,388 @@
 import os
-# return t.render(vague_text=vague_text, project_key=project_key, context_docs=context_docs)
+import json
+import time
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+from .registry import ModelRegistry
+from .clients import get_async_client, get_session, request_timeout
+from .metrics import record_tokens
+
+
+load_dotenv()
+
+
+PROVIDER = os.getenv("PROVIDER", "ollama").lower()
+log = logging.getLogger(__name__)
+
+
+
+
+def count_tokens(text: str) -> int:
+	# exact for the local T5 model; remote providers are estimated at ~4 characters per token
+	if PROVIDER == "huggingface":
+		return len(load_huggingface_t5().tokenizer(text, add_special_tokens=False).input_ids)
+	return (len(text) + 3) // 4
 
 
 # ---------- Providers ----------
 
 
-def gen_openai(prompt: str):
-	import requests, json
+def _openai_request(prompt: str):
 	base = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 	model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 	headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}", "Content-Type": "application/json"}
 	payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "temperature": 0.2}
-	r = requests.post(f"{base}/chat/completions", headers=headers, json=payload)
-	r.raise_for_status()
-	return r.json()["choices"][0]["message"]["content"].strip()
+	return f"{base}/chat/completions", headers, payload
 
 
 
 
-def gen_ollama(prompt: str):
-	import requests
-	base = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-	model = os.getenv("OLLAMA_MODEL", "llama3")
-	r = requests.post(f"{base}/api/generate", json={"model": model, "prompt": prompt, "options": {"temperature": 0.2}})
+def _openai_content(body: dict) -> str:
+	usage = body.get("usage") or {}
+	record_tokens("openai", usage.get("prompt_tokens"), usage.get("completion_tokens"))
+	return body["choices"][0]["message"]["content"].strip()
+
+
+
+
+def _ollama_base():
+	return os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"), os.getenv("OLLAMA_MODEL", "llama3")
+
+
+
+
+def gen_openai(prompt: str):
+	url, headers, payload = _openai_request(prompt)
+	r = get_session("openai").post(url, headers=headers, json=payload, timeout=request_timeout())
 	r.raise_for_status()
-	txt = ""
-	for line in r.iter_lines():
-		if not line:
-			continue
-		try:
-			part = line.decode("utf-8")
-		except Exception:
-			part = line
-		txt += part
-	# Ollama returns JSONL; a simpler approach is to call without stream, but many builds stream by default
-	# For POC simplicity, call non-stream:
-	r = requests.post(f"{base}/api/generate", json={"model": model, "prompt": prompt, "stream": False, "options": {"temperature": 0.2}})
+	return _openai_content(r.json())
+
+
+
+
+async def agen_openai(prompt: str):
+	url, headers, payload = _openai_request(prompt)
+	r = await get_async_client("openai").post(url, headers=headers, json=payload)
 	r.raise_for_status()
-	return r.json().get("response", "").strip()
+	return _openai_content(r.json())
+
+
+
+
+def _ollama_chunk(line):
+	# one JSON object per line: {"response": "<token>", "done": false, ...}
+	if not line:
+		return "", False
+	if isinstance(line, bytes):
+		line = line.decode("utf-8")
+	obj = json.loads(line)
+	if obj.get("error"):
+		raise RuntimeError(f"Ollama error: {obj['error']}")
+	if obj.get("done"):
+		# the final object carries the token counts for the whole call
+		record_tokens("ollama", obj.get("prompt_eval_count"), obj.get("eval_count"))
+	return obj.get("response", ""), bool(obj.get("done"))
+
+
+
+
+def stream_ollama(prompt: str):
+	base, model = _ollama_base()
+	payload = {"model": model, "prompt": prompt, "stream": True, "options": {"temperature": 0.2}}
+	with get_session("ollama").post(f"{base}/api/generate", json=payload, stream=True, timeout=request_timeout()) as r:
+		r.raise_for_status()
+		for line in r.iter_lines():
+			token, done = _ollama_chunk(line)
+			if token:
+				yield token
+			if done:
+				break
+
+
+
+
+def gen_ollama(prompt: str):
+	return "".join(stream_ollama(prompt)).strip()
+
+
+
+
+async def astream_ollama(prompt: str):
+	base, model = _ollama_base()
+	payload = {"model": model, "prompt": prompt, "stream": True, "options": {"temperature": 0.2}}
+	async with get_async_client("ollama").stream("POST", f"{base}/api/generate", json=payload) as r:
+		r.raise_for_status()
+		async for line in r.aiter_lines():
+			token, done = _ollama_chunk(line)
+			if token:
+				yield token
+			if done:
+				break
+
+
+
+
+async def agen_ollama(prompt: str):
+	return "".join([t async for t in astream_ollama(prompt)]).strip()
+
+
+
+
+async def astream_openai(prompt: str):
+	url, headers, payload = _openai_request(prompt)
+	payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+	async with get_async_client("openai").stream("POST", url, headers=headers, json=payload) as r:
+		r.raise_for_status()
+		async for line in r.aiter_lines():
+			if not line.startswith("data:"):
+				continue
+			data = line[len("data:"):].strip()
+			if data == "[DONE]":
+				break
+			chunk = json.loads(data)
+			if chunk.get("usage"):
+				# sent as a last chunk with no choices
+				record_tokens("openai", chunk["usage"].get("prompt_tokens"), chunk["usage"].get("completion_tokens"))
+			if not chunk.get("choices"):
+				continue
+			delta = chunk["choices"][0].get("delta", {}).get("content")
+			if delta:
+				yield delta
+
+
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+
+
+def get_registry() -> ModelRegistry:
+	global _registry
+	with _registry_lock:
+		if _registry is None:
+			_registry = ModelRegistry(max_memory_mb=int(os.getenv("HF_MAX_MEMORY_MB", "0")))
+		return _registry
+
+
+
 
+def hf_adapters() -> dict:
+	# HF_ADAPTERS="billing=models/lora-billing,mobile=models/lora-mobile"
+	spec = os.getenv("HF_ADAPTERS", "")
+	out = {}
+	for item in spec.split(","):
+		if "=" in item:
+			name, path = item.split("=", 1)
+			out[name.strip()] = path.strip()
+	return out
 
 
 
-def gen_huggingface_t5(prompt: str):
-	from transformers import T5ForConditionalGeneration, T5TokenizerFast
+
+def load_huggingface_t5():
 	path = os.getenv("HF_MODEL_PATH", "models/t5-lora-domain")
-	tok = T5TokenizerFast.from_pretrained(path)
-	mdl = T5ForConditionalGeneration.from_pretrained(path)
-	ids = tok(prompt, return_tensors="pt").input_ids
-	out = mdl.generate(ids, max_new_tokens=400)
-	return tok.decode(out[0], skip_special_tokens=True).strip()
+	return get_registry().get(path, adapters=hf_adapters())
+
+
+
+
+def _generate_t5_batch(loaded, prompts, adapter=None):
+	import torch
+	tok = loaded.tokenizer
+	enc = tok(prompts, return_tensors="pt", padding=True)
+	with loaded.activated(adapter) as mdl, torch.no_grad():
+		out = mdl.generate(input_ids=enc.input_ids, attention_mask=enc.attention_mask, max_new_tokens=400)
+	record_tokens("huggingface", int(enc.attention_mask.sum()), int((out != tok.pad_token_id).sum()))
+	return [t.strip() for t in tok.batch_decode(out, skip_special_tokens=True)]
+
+
+
+
+class T5BatchScheduler:
+	"""
+	Collects concurrent huggingface prompts for up to max_wait_ms (or until
+	max_batch_size are queued) and runs them through generate() as one padded batch.
+	"""
+
+	def __init__(self, max_batch_size: int = 8, max_wait_ms: float = 10):
+		self.max_batch_size = max(1, int(max_batch_size))
+		self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+		self._queue = queue.Queue()
+		self._thread = None
+		self._start_lock = threading.Lock()
+		self._stats_lock = threading.Lock()
+		self.requests = 0
+		self.batches = 0
+		self.batch_sizes = {}
+		self.queue_wait_s = 0.0
+
+	def submit(self, prompt: str, adapter: str = None) -> Future:
+		self._ensure_started()
+		fut = Future()
+		self._queue.put((prompt, adapter, fut, time.monotonic()))
+		return fut
+
+	def stats(self) -> dict:
+		with self._stats_lock:
+			return {
+				"queue_depth": self._queue.qsize(),
+				"requests": self.requests,
+				"batches": self.batches,
+				"avg_batch_size": (self.requests / self.batches) if self.batches else 0.0,
+				"batch_size_counts": dict(sorted(self.batch_sizes.items())),
+				"avg_queue_wait_ms": (1000.0 * self.queue_wait_s / self.requests) if self.requests else 0.0,
+				"max_batch_size": self.max_batch_size,
+				"max_wait_ms": self.max_wait * 1000.0,
+			}
+
+	def _ensure_started(self):
+		with self._start_lock:
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._run, name="t5-batcher", daemon=True)
+				self._thread.start()
+
+	def _collect(self):
+		batch = [self._queue.get()]
+		deadline = time.monotonic() + self.max_wait
+		while len(batch) < self.max_batch_size:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				break
+			try:
+				batch.append(self._queue.get(timeout=remaining))
+			except queue.Empty:
+				break
+		return batch
+
+	def _run(self):
+		while True:
+			# nothing may end this loop: the thread is never restarted
+			try:
+				self._run_batch(self._collect())
+			except Exception:
+				log.exception("T5 batch failed")
+
+	def _run_batch(self, batch):
+		now = time.monotonic()
+		# callers that were cancelled while queued (client disconnects) are dropped;
+		# the rest are marked running, so a later cancel can't race set_result
+		batch = [it for it in batch if it[2].set_running_or_notify_cancel()]
+		# an adapter is active for the whole generate() call, so batch per adapter
+		groups = {}
+		for item in batch:
+			groups.setdefault(item[1], []).append(item)
+		for adapter, items in groups.items():
+			self._record(items, now)
+			try:
+				outs = _generate_t5_batch(load_huggingface_t5(), [it[0] for it in items], adapter=adapter)
+			except Exception as e:
+				for it in items:
+					it[2].set_exception(e)
+				continue
+			for it, out in zip(items, outs):
+				it[2].set_result(out)
 
+	def _record(self, items, now):
+		with self._stats_lock:
+			self.requests += len(items)
+			self.batches += 1
+			self.batch_sizes[len(items)] = self.batch_sizes.get(len(items), 0) + 1
+			self.queue_wait_s += sum(now - it[3] for it in items)
 
 
 
-def generate(prompt: str) -> str:
+
+_scheduler = None
+
+
+
+
+def get_scheduler() -> T5BatchScheduler:
+	global _scheduler
+	with _registry_lock:
+		if _scheduler is None:
+			_scheduler = T5BatchScheduler(
+				max_batch_size=int(os.getenv("HF_BATCH_MAX_SIZE", "8")),
+				max_wait_ms=float(os.getenv("HF_BATCH_MAX_WAIT_MS", "10")),
+			)
+		return _scheduler
+
+
+
+
+def gen_huggingface_t5(prompt: str, adapter: str = None):
+	return get_scheduler().submit(prompt, adapter=adapter).result()
+
+
+
+
+def model_id() -> str:
+	# identifies the generator for cache keys: provider plus model name/path
+	if PROVIDER == "openai":
+		return f"openai:{os.getenv('OPENAI_MODEL', 'gpt-4o-mini')}"
+	elif PROVIDER == "huggingface":
+		return f"huggingface:{os.getenv('HF_MODEL_PATH', 'models/t5-lora-domain')}"
+	return f"ollama:{_ollama_base()[1]}"
+
+
+
+
+async def agen_huggingface_t5(prompt: str, adapter: str = None):
+	# the batch scheduler runs generation on its own thread; just await its future
+	return await asyncio.wrap_future(get_scheduler().submit(prompt, adapter=adapter))
+
+
+
+
+def huggingface_stats() -> dict:
+	return {"registry": get_registry().stats(), "batching": get_scheduler().stats()}
+
+
+
+
+def warm_up():
+	if PROVIDER == "huggingface":
+		load_huggingface_t5()
+
+
+
+
+def generate(prompt: str, adapter: str = None) -> str:
 	if PROVIDER == "openai":
 		return gen_openai(prompt)
 	elif PROVIDER == "huggingface":
-		return gen_huggingface_t5(prompt)
+		return gen_huggingface_t5(prompt, adapter=adapter)
+	else:
+		return gen_ollama(prompt)
+
+
+
+
+async def agenerate(prompt: str, adapter: str = None) -> str:
+	if PROVIDER == "openai":
+		return await agen_openai(prompt)
+	elif PROVIDER == "huggingface":
+		return await agen_huggingface_t5(prompt, adapter=adapter)
+	else:
+		return await agen_ollama(prompt)
+
+
+
+
+async def astream_generate(prompt: str, adapter: str = None):
+	# local T5 generation is batched, not incremental, so it arrives as one chunk
+	if PROVIDER == "openai":
+		async for t in astream_openai(prompt):
+			yield t
+	elif PROVIDER == "huggingface":
+		yield await agen_huggingface_t5(prompt, adapter=adapter)
 	else:
-		return gen_ollama(prompt)
\ No newline at end of file
+		async for t in astream_ollama(prompt):
+			yield t
\ No newline at end of file
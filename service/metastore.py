@@ -0,0 +1,152 @@
+import os
+import json
+import mmap
+from types import MappingProxyType
+import numpy as np
+
+
+"""
+Offset-indexed ticket metadata store.
+
+  meta.jsonl - one JSON record per line; line i belongs to vector id i
+  meta.idx   - .npy array of uint64 byte offsets (n + 1 entries, last = end)
+
+The JSONL file is memory-mapped read-only, so uvicorn workers share the page
+cache instead of each holding a parsed copy, and only the requested lines are
+decoded. Records come back as read-only mappings.
+"""
+
+
+
+
+def store_paths(path: str):
+	base = path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+	return base + ".jsonl", base + ".idx"
+
+
+
+
+def freeze_record(rec):
+	if rec is None:
+		return None
+	return MappingProxyType({k: tuple(v) if isinstance(v, list) else v for k, v in rec.items()})
+
+
+
+
+class MetaStore:
+	def __init__(self, path: str):
+		self.data_path, self.idx_path = store_paths(path)
+		self.offsets = np.load(self.idx_path, mmap_mode="r")
+		self._f = open(self.data_path, "rb")
+		size = int(self.offsets[-1]) if len(self.offsets) else 0
+		self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+	@staticmethod
+	def exists(path: str) -> bool:
+		return all(os.path.exists(p) for p in store_paths(path))
+
+	def __len__(self):
+		return max(0, len(self.offsets) - 1)
+
+	def raw(self, i: int):
+		if i < 0 or i >= len(self):
+			return None
+		start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+		return json.loads(self._mm[start:end])
+
+	def get(self, i: int):
+		return freeze_record(self.raw(i))
+
+	def get_many(self, ids):
+		return [self.get(int(i)) for i in ids]
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self.raw(i)
+
+	def close(self):
+		if self._mm is not None:
+			self._mm.close()
+		self._f.close()
+
+
+
+
+def doc_id(meta):
+	"""Identity of a ticket across builds: its key, or the content hash when the export has no keys."""
+	return meta.get("key") or meta.get("hash")
+
+
+
+
+def live_ids(store):
+	"""Vector ids still in the index: the last line per doc_id, as incremental builds leave it."""
+	# lines with neither key nor hash (pre-hash builds) are each their own document
+	return np.asarray(sorted({doc_id(m) or i: i for i, m in enumerate(store)}.values()), dtype=np.int64)
+
+
+
+
+def _write_records(f, records, offsets):
+	pos = offsets[-1]
+	for rec in records:
+		line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+		f.write(line)
+		pos += len(line)
+		offsets.append(pos)
+
+
+
+
+def _save_offsets(idx_path, offsets):
+	tmp = idx_path + ".tmp"
+	with open(tmp, "wb") as f:
+		np.save(f, np.asarray(offsets, dtype=np.uint64))
+	os.replace(tmp, idx_path)
+
+
+
+
+class StoreWriter:
+	"""Streams records into a new store; nothing is visible until close() swaps it in."""
+
+	def __init__(self, path: str):
+		self.data_path, self.idx_path = store_paths(path)
+		self.offsets = [0]
+		self._f = open(self.data_path + ".tmp", "wb")
+
+	def write(self, records):
+		_write_records(self._f, records, self.offsets)
+
+	def close(self):
+		self._f.close()
+		os.replace(self.data_path + ".tmp", self.data_path)
+		_save_offsets(self.idx_path, self.offsets)
+		return len(self.offsets) - 1
+
+
+
+
+def write_store(path: str, records):
+	w = StoreWriter(path)
+	w.write(records)
+	return w.close()
+
+
+
+
+def append_store(path: str, records):
+	"""
+	Append records after the last indexed one. Bytes past the last offset (left by
+	an interrupted append) are truncated first; the offset file is replaced last,
+	so readers only ever see complete records.
+	"""
+	data_path, idx_path = store_paths(path)
+	offsets = [int(o) for o in np.load(idx_path)]
+	with open(data_path, "r+b") as f:
+		f.seek(offsets[-1])
+		f.truncate()
+		_write_records(f, records, offsets)
+	_save_offsets(idx_path, offsets)
+	return len(offsets) - 1
\ No newline at end of file
@@ -0,0 +1,105 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily
+
+
+"""
+Prometheus metrics for the enhance hot path, served by GET /metrics.
+
+  enhancer_stage_seconds{endpoint,stage}         encode | classify | search | lookup | render | generate | jira | total
+  enhancer_llm_tokens_total{provider,kind}       prompt | completion, as reported by the provider
+  enhancer_prompt_tokens{provider}               rendered prompt size (provider tokenizer or estimate)
+  enhancer_context_docs_total{outcome}           kept | truncated | low_score | duplicate | over_budget
+  enhancer_cache_lookups_total{cache,result}     response cache, hit | miss
+  enhancer_cache_stats_total{cache,result}       query-embedding cache, read from QueryEncoder.stats()
+
+Each uvicorn worker keeps its own registry.
+"""
+
+
+STAGE_SECONDS = Histogram(
+	"enhancer_stage_seconds", "Wall time per enhance stage", ["endpoint", "stage"],
+	buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+LLM_TOKENS = Counter("enhancer_llm_tokens", "LLM tokens by provider", ["provider", "kind"])
+PROMPT_TOKENS = Histogram(
+	"enhancer_prompt_tokens", "Rendered prompt size in tokens", ["provider"],
+	buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+CONTEXT_DOCS = Counter("enhancer_context_docs", "Retrieved docs by what happened to them in context assembly", ["outcome"])
+CACHE_LOOKUPS = Counter("enhancer_cache_lookups", "Cache lookups", ["cache", "result"])
+
+
+
+
+def record_tokens(provider: str, prompt_tokens, completion_tokens):
+	if prompt_tokens:
+		LLM_TOKENS.labels(provider, "prompt").inc(int(prompt_tokens))
+	if completion_tokens:
+		LLM_TOKENS.labels(provider, "completion").inc(int(completion_tokens))
+
+
+
+
+def record_context(outcome: str):
+	CONTEXT_DOCS.labels(outcome).inc()
+
+
+
+
+def record_cache(cache: str, hit: bool):
+	CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+
+
+class StageTimer:
+	"""Times named stages into STAGE_SECONDS and keeps a per-request breakdown in ms."""
+
+	def __init__(self, endpoint: str):
+		self.endpoint = endpoint
+		self.timings = {}
+		self._t0 = time.perf_counter()
+
+	@contextmanager
+	def stage(self, name: str):
+		t0 = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(name, time.perf_counter() - t0)
+
+	def observe(self, name: str, seconds: float):
+		STAGE_SECONDS.labels(self.endpoint, name).observe(seconds)
+		self.timings[name] = round(self.timings.get(name, 0.0) + seconds * 1000.0, 3)
+
+	def finish(self) -> dict:
+		self.observe("total", time.perf_counter() - self._t0)
+		return self.timings
+
+
+
+
+class CallbackCounter:
+	"""Exposes hit/miss counters kept elsewhere (e.g. QueryEncoder) at scrape time."""
+
+	def __init__(self, name: str, doc: str, cache: str, stats_fn):
+		self.name = name
+		self.doc = doc
+		self.cache = cache
+		self.stats_fn = stats_fn
+
+	def collect(self):
+		fam = CounterMetricFamily(self.name, self.doc, labels=["cache", "result"])
+		stats = self.stats_fn()
+		if stats:
+			fam.add_metric([self.cache, "hit"], stats["hits"])
+			fam.add_metric([self.cache, "miss"], stats["misses"])
+		yield fam
+
+
+
+
+def register_cache_stats(cache: str, stats_fn):
+	REGISTRY.register(CallbackCounter("enhancer_cache_stats", "Hits/misses of caches that keep their own counters", cache, stats_fn))
@@ -0,0 +1,147 @@
+import os
+import re
+import numpy as np
+
+
+"""
+Priority (and derived severity) prediction from ticket embeddings.
+
+PriorityModel is a multinomial logistic regression over the normalized
+sentence embeddings the index already stores: predicting a batch is one
+matrix multiply and a softmax. It is trained by scripts/train_priority.py on
+embeddings.npy and the Jira `priority` field, and saved as a .npz:
+
+  mu, sd (dim)  feature standardization fitted on the training rows
+  W (dim x classes), b (classes), classes (labels), embed_model
+
+keyword_priority() is the old substring heuristic from scripts/test_search.py,
+kept as the baseline the trained model is scored against.
+"""
+
+
+KEYWORD_RULES = [
+	(("crash", "data loss", "not triggered", "unresponsive", "corruption", "failover"), "High"),
+	(("latency", "delay", "slow", "high cpu", "memory leak", "timeout"), "Medium"),
+	(("ui", "format", "glitch", "display", "alignment"), "Low"),
+]
+DEFAULT_PRIORITY = "Medium"
+SEVERITY = {"Highest": "Critical", "High": "Critical", "Medium": "Major", "Low": "Minor", "Lowest": "Minor"}
+_KEYWORD_RES = [(re.compile("|".join(re.escape(w) for w in words)), label) for words, label in KEYWORD_RULES]
+
+
+
+
+def severity_of(priority: str) -> str:
+	return SEVERITY.get(priority, "Major")
+
+
+
+
+def keyword_priority(texts):
+	"""Baseline: first rule with a keyword in the lowercased text, else Medium."""
+	out = []
+	for text in texts:
+		text = text.lower()
+		out.append(next((label for rx, label in _KEYWORD_RES if rx.search(text)), DEFAULT_PRIORITY))
+	return out
+
+
+
+
+def _softmax(Z):
+	Z = Z - Z.max(axis=1, keepdims=True)
+	np.exp(Z, out=Z)
+	Z /= Z.sum(axis=1, keepdims=True)
+	return Z
+
+
+
+
+class PriorityModel:
+	def __init__(self, W, b, classes, mu=None, sd=None, embed_model: str = None):
+		dim = W.shape[0]
+		# standardizing is folded into W and b, so predicting stays one matmul
+		mu = np.zeros(dim, dtype=np.float32) if mu is None else np.asarray(mu, dtype=np.float32)
+		sd = np.ones(dim, dtype=np.float32) if sd is None else np.asarray(sd, dtype=np.float32)
+		self.mu, self.sd = mu, sd
+		self.W = np.ascontiguousarray(W / sd[:, None], dtype=np.float32)
+		self.b = np.asarray(b - (mu / sd) @ W, dtype=np.float32)
+		self._W, self._b = np.asarray(W, dtype=np.float32), np.asarray(b, dtype=np.float32)
+		self.classes = [str(c) for c in classes]
+		self.embed_model = embed_model
+
+	@staticmethod
+	def exists(path: str) -> bool:
+		return bool(path) and os.path.exists(path)
+
+	@classmethod
+	def load(cls, path: str):
+		with np.load(path, allow_pickle=False) as z:
+			embed_model = str(z["embed_model"]) if "embed_model" in z.files else None
+			return cls(z["W"], z["b"], z["classes"].tolist(), z["mu"], z["sd"], embed_model)
+
+	def save(self, path: str):
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		tmp = path + ".tmp.npz"
+		np.savez(
+			tmp, W=self._W, b=self._b, mu=self.mu, sd=self.sd, classes=np.asarray(self.classes),
+			embed_model=np.asarray(self.embed_model or ""),
+		)
+		os.replace(tmp, path)
+
+	def predict_proba(self, X) -> np.ndarray:
+		return _softmax(np.asarray(X, dtype=np.float32).reshape(-1, self.W.shape[0]) @ self.W + self.b)
+
+	def predict(self, X):
+		"""[{"priority", "severity", "confidence"}] per row of X."""
+		P = self.predict_proba(X)
+		best = P.argmax(axis=1)
+		conf = P[np.arange(len(P)), best]
+		return [
+			{"priority": self.classes[c], "severity": severity_of(self.classes[c]), "confidence": round(float(p), 4)}
+			for c, p in zip(best.tolist(), conf.tolist())
+		]
+
+	@classmethod
+	def train(cls, X, y, classes, ids=None, epochs: int = 200, lr: float = 1.0, l2: float = 1e-4, batch: int = 65536,
+			  balanced: bool = True, embed_model: str = None, seed: int = 0):
+		"""
+		X: embeddings (a memmap is read `batch` rows at a time), ids: the rows of X
+		to train on (default all), y: class index per id. Minibatch gradient
+		descent with momentum on the standardized features and cross-entropy;
+		`balanced` weights each class by n / (classes * count).
+		"""
+		ids = np.arange(X.shape[0]) if ids is None else np.asarray(ids, dtype=np.int64)
+		n, dim = len(ids), X.shape[1]
+		# sentence embeddings share a large common direction; centering and scaling
+		# each dimension makes plain gradient descent converge in far fewer epochs
+		s1, s2 = np.zeros(dim), np.zeros(dim)
+		for start in range(0, n, batch):
+			Xb = np.asarray(X[ids[start:start + batch]], dtype=np.float64)
+			s1 += Xb.sum(axis=0)
+			s2 += (Xb * Xb).sum(axis=0)
+		mu = (s1 / n).astype(np.float32)
+		sd = np.sqrt(np.maximum(s2 / n - (s1 / n) ** 2, 1e-12)).astype(np.float32)
+		C = len(classes)
+		y = np.asarray(y, dtype=np.int64)
+		counts = np.bincount(y, minlength=C).astype(np.float32)
+		cw = n / (C * np.maximum(counts, 1)) if balanced else np.ones(C, dtype=np.float32)
+		W = np.zeros((dim, C), dtype=np.float32)
+		b = np.log(np.maximum(counts, 1) / n).astype(np.float32) if not balanced else np.zeros(C, dtype=np.float32)
+		vW, vb = np.zeros_like(W), np.zeros_like(b)
+		rng = np.random.default_rng(seed)
+		for _ in range(epochs):
+			order = rng.permutation(n)
+			for start in range(0, n, batch):
+				# sorted rows read a memmap sequentially
+				rows = np.sort(order[start:start + batch])
+				Xb = (np.asarray(X[ids[rows]], dtype=np.float32) - mu) / sd
+				yb = y[rows]
+				G = _softmax(Xb @ W + b)
+				G[np.arange(len(yb)), yb] -= 1.0
+				G *= (cw[yb] / cw[yb].sum())[:, None].astype(np.float32)
+				vW = 0.9 * vW + Xb.T @ G + l2 * W
+				vb = 0.9 * vb + G.sum(axis=0)
+				W -= lr * vW
+				b -= lr * vb
+		return cls(W, b, classes, mu, sd, embed_model)
@@ -0,0 +1,135 @@
+import os
+import threading
+from jinja2 import Template
+
+from .bm25 import tokenize
+from .metrics import record_context
+
+
+"""
+Prompt assembly: compiled template cache and token-budgeted context.
+
+Templates are compiled once per path and recompiled when the file's mtime or
+size changes, so edits to prompts/*.md apply without a restart.
+
+build_context() turns ranked search hits into the docs that go into the prompt:
+  1. drop hits whose vector score is below [retrieval] min_score
+  2. drop near-duplicates of a higher-ranked doc (token-set Jaccard >= dedup_threshold)
+  3. cut each description to max_doc_tokens
+  4. keep docs in rank order until the provider's context_tokens budget is spent;
+     the doc that crosses the budget is truncated to fit if enough room is left
+"""
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+DEFAULT_BUDGETS = {"openai": 3000, "ollama": 1500, "huggingface": 300}
+MIN_DOC_TOKENS = 32
+
+
+
+
+def get_template(path: str) -> Template:
+	st = os.stat(path)
+	stamp = (st.st_mtime_ns, st.st_size)
+	with _templates_lock:
+		cached = _templates.get(path)
+		if cached is not None and cached[0] == stamp:
+			return cached[1]
+	with open(path, "r", encoding="utf-8") as f:
+		template = Template(f.read())
+	with _templates_lock:
+		_templates[path] = (stamp, template)
+	return template
+
+
+
+
+def render_prompt(template_path: str, vague_text: str, project_key: str, context_docs):
+	return get_template(template_path).render(vague_text=vague_text, project_key=project_key, context_docs=context_docs)
+
+
+
+
+def truncate_tokens(text: str, max_tokens: int, count) -> str:
+	"""Longest word prefix of `text` within max_tokens (by `count`), with an ellipsis if cut."""
+	if not text or count(text) <= max_tokens:
+		return text
+	words = text.split()
+	lo, hi = 0, len(words)
+	while lo < hi:
+		mid = (lo + hi + 1) // 2
+		if count(" ".join(words[:mid]) + " ...") <= max_tokens:
+			lo = mid
+		else:
+			hi = mid - 1
+	return " ".join(words[:lo]) + " ..." if lo else ""
+
+
+
+
+def _doc_tokens(doc, count) -> int:
+	# what the template renders per doc: key, title and details
+	return count(f"- Key: {doc.get('key')} | Title: {doc.get('summary') or ''}\nRelevant details: {doc.get('description') or ''}")
+
+
+
+
+def _jaccard(a: set, b: set) -> float:
+	if not a or not b:
+		return 0.0
+	return len(a & b) / float(len(a | b))
+
+
+
+
+def context_settings(cfg: dict, provider: str) -> dict:
+	prompt = cfg.get("prompt", {})
+	budgets = {**DEFAULT_BUDGETS, **prompt.get("context_tokens", {})}
+	return {
+		"budget": int(budgets.get(provider, DEFAULT_BUDGETS["ollama"])),
+		"max_doc_tokens": int(prompt.get("max_doc_tokens", 200)),
+		"dedup_threshold": float(prompt.get("dedup_threshold", 0.8)),
+		"min_score": float(cfg.get("retrieval", {}).get("min_score", 0.0)),
+	}
+
+
+
+
+def build_context(hits, settings: dict, count, max_docs: int = None):
+	"""hits: ranked search results (dicts). Returns the docs to render, in rank order."""
+	budget = settings["budget"]
+	out, seen = [], []
+	for hit in hits:
+		if max_docs is not None and len(out) >= max_docs:
+			break
+		if "score" in hit and hit["score"] < settings["min_score"]:
+			record_context("low_score")
+			continue
+		toks = set(tokenize(f"{hit.get('summary') or ''} {hit.get('description') or ''}"))
+		if any(_jaccard(toks, s) >= settings["dedup_threshold"] for s in seen):
+			record_context("duplicate")
+			continue
+
+		doc = dict(hit)
+		desc = doc.get("description") or ""
+		short = truncate_tokens(desc, settings["max_doc_tokens"], count)
+		cost = _doc_tokens({**doc, "description": short}, count)
+		if cost > budget:
+			# fit what's left of the budget, unless that would leave only a stub
+			room = count(short) - (cost - budget)
+			if room < MIN_DOC_TOKENS:
+				record_context("over_budget")
+				break
+			short = truncate_tokens(desc, room, count)
+			cost = _doc_tokens({**doc, "description": short}, count)
+		if short != desc:
+			doc["description"] = short
+			doc["truncated"] = True
+			record_context("truncated")
+		record_context("kept")
+		out.append(doc)
+		seen.append(toks)
+		budget -= cost
+	return out
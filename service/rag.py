@@ -1,26 +1,226 @@
 import os, json
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+
+from .encoder import build_encoder
+from .metastore import MetaStore, freeze_record
+from .bm25 import BM25Index, rrf_fuse
+from .shards import ShardSet
+from .expand import QueryExpander
+from .duplicates import DuplicateIndex
+from .storage import read_index
+
+
+MODES = ("vector", "bm25", "hybrid", "multi_query")
+
+
+def tune_index(index, params: dict):
+	# search-time knobs for ANN indexes; ignored by index types they don't apply to
+	ps = faiss.ParameterSpace()
+	if "nprobe" in params and faiss.try_extract_index_ivf(index) is not None:
+		ps.set_index_parameter(index, "nprobe", int(params["nprobe"]))
+	if "ef_search" in params:
+		base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+		if isinstance(base, faiss.IndexHNSW):
+			ps.set_index_parameter(index, "efSearch", int(params["ef_search"]))
+
+
 
 
 class Retriever:
-	def __init__(self, cfg):
-		self.model = SentenceTransformer(cfg.get("index", {}).get("embed_model", "sentence-transformers/all-MiniLM-L6-v2"))
-		self.index = faiss.read_index(cfg["index"]["faiss_path"]) if os.path.exists(cfg["index"]["faiss_path"]) else None
-		with open("index/meta.json", "r", encoding="utf-8") as f:
-			self.meta = json.load(f)
+	def __init__(self, cfg, encoder=None):
+		self.encoder = encoder or build_encoder(cfg.get("index", {}))
+		# mmap: the index file is paged in from the OS cache instead of copied into this process
+		mmap = bool(cfg["index"].get("mmap", False))
+		self.index = read_index(cfg["index"]["faiss_path"], mmap) if os.path.exists(cfg["index"]["faiss_path"]) else None
+		if self.index is not None:
+			tune_index(self.index, cfg.get("index", {}))
+		meta_path = cfg["index"].get("meta_path", "index/meta.jsonl")
+		if MetaStore.exists(meta_path):
+			self.meta = MetaStore(meta_path)
+		else:
+			# legacy builds: a single JSON list held in memory
+			legacy = os.path.join(os.path.dirname(meta_path), "meta.json")
+			self.meta = []
+			if os.path.exists(legacy):
+				with open(legacy, "r", encoding="utf-8") as f:
+					self.meta = [freeze_record(m) for m in json.load(f)]
 
-	def search(self, query: str, k: int = 5):
+		bm25_path = cfg["index"].get("bm25_path", "index/bm25")
+		self.bm25 = BM25Index.load(bm25_path) if BM25Index.exists(bm25_path) else None
+		self.default_mode = cfg.get("retrieval", {}).get("mode", "vector")
+		self.expander = QueryExpander.from_config(cfg)
+		# near-duplicate clusters from scripts/find_duplicates.py, if it was run for this index
+		dup_path = cfg["index"].get("duplicates_path", "index/duplicates.json")
+		self.duplicates = DuplicateIndex(dup_path) if DuplicateIndex.exists(dup_path) else None
+
+		shards_path = cfg["index"].get("shards_path", "index/shards")
+		retrieval = cfg.get("retrieval", {})
+		self.shards = ShardSet(
+			shards_path,
+			tune=lambda idx: tune_index(idx, cfg.get("index", {})),
+			min_shard_size=retrieval.get("min_shard_size", 50),
+			threads=retrieval.get("shard_threads", 4),
+			mmap=mmap,
+		) if self.index is not None and ShardSet.exists(shards_path) else None
+
+	def encode(self, query: str) -> np.ndarray:
+		return self.encode_batch([query])[0]
+
+	def encode_batch(self, queries) -> np.ndarray:
+		return self.encoder.encode(queries)
+
+	def resolve_mode(self, mode: str = None) -> str:
+		mode = mode or self.default_mode
+		if mode not in MODES:
+			raise ValueError(f"Unknown retrieval mode: {mode}")
+		if mode in ("bm25", "hybrid") and self.bm25 is None:
+			return "vector"
+		return mode
+
+	def search(self, query: str, k: int = 5, mode: str = None, q: np.ndarray = None, projects=None):
+		"""
+		mode: "vector" (FAISS), "bm25" (keyword), "hybrid" (both, merged with
+		reciprocal-rank fusion) or "multi_query" (expanded query variants searched
+		together and fused). `q` is the query embedding if already computed.
+		`projects` limits the search to those projects' shards, if shards were built.
+		"""
+		return self.search_batch(
+			[query], k=k, modes=[mode], Q=None if q is None else np.asarray(q).reshape(1, -1), projects=[projects]
+		)[0]
+
+	def search_vector(self, q: np.ndarray, k: int = 5):
 		if self.index is None:
 			return []
-		q = self.model.encode([query], normalize_embeddings=True)
-		D, I = self.index.search(q, k)
+		hits = self._vector_hits(np.asarray(q).reshape(1, -1), k)[0]
+		return self._records([s for _, s in hits], [i for i, _ in hits], "score")
+
+	def search_batch(self, queries, k=5, modes=None, Q: np.ndarray = None, projects=None):
+		"""
+		Search many queries at once: one batched encode and one multi-row FAISS
+		search per index (global or shard) that any query is routed to. `k`,
+		`modes` and `projects` may be lists; `projects` entries are lists of
+		project keys (or None for all projects).
+		"""
+		n = len(queries)
+		ks = list(k) if isinstance(k, (list, tuple)) else [k] * n
+		modes = [self.resolve_mode(m) for m in (modes or [None] * n)]
+		projects = projects or [None] * n
+		# None = unrouted (global index, no project filter)
+		routes = [self.shards.route(p) if self.shards is not None else None for p in projects]
+		vec_rows = [i for i, m in enumerate(modes) if m != "bm25"] if self.index is not None else []
+
+		hits, multi = {}, {}
+		if vec_rows:
+			if Q is None:
+				Q = self.encode_batch([queries[i] for i in vec_rows])
+				Q_rows = Q
+			else:
+				Q_rows = np.asarray(Q)[vec_rows]
+			# multi_query: the extra variants ride along as more rows of the same encode + search
+			owners, variants = [], []
+			for i in vec_rows:
+				if modes[i] == "multi_query":
+					extra = self.expander.expand(queries[i])[1:]
+					owners += [i] * len(extra)
+					variants += extra
+			if variants:
+				Q_rows = np.vstack([Q_rows, self.encode_batch(variants)])
+			# hybrid and multi_query over-fetch so fusion has candidates to re-rank
+			depth = max(ks[i] if modes[i] == "vector" else max(ks[i] * 4, 20) for i in vec_rows)
+			rows = list(vec_rows) + owners
+			found = self._vector_search(Q_rows, [routes[i] for i in rows], depth)
+			hits = dict(zip(vec_rows, found[:len(vec_rows)]))
+			multi = {i: [hits[i]] for i in vec_rows if modes[i] == "multi_query"}
+			for i, h in zip(owners, found[len(vec_rows):]):
+				multi[i].append(h)
+
+		out = []
+		for i, (query, kk, mode) in enumerate(zip(queries, ks, modes)):
+			# BM25 is global: a routed query only ranks the docs of its shards
+			allowed = self.shards.members(routes[i]) if routes[i] is not None else None
+			if mode == "bm25":
+				b_scores, b_ids = self._bm25_hits(query, kk, allowed)
+				out.append(self._records(b_scores, b_ids, "bm25_score"))
+			elif i not in hits:
+				out.append([])
+			elif mode == "vector":
+				h = hits[i][:kk]
+				out.append(self._records([s for _, s in h], [j for j, _ in h], "score"))
+			elif mode == "multi_query":
+				out.append(self._multi(multi[i], kk))
+			else:
+				out.append(self._hybrid(query, hits[i], kk, allowed))
+		return out
+
+	def _vector_search(self, Q: np.ndarray, routes, k: int):
+		"""Per-row [(id, score)]: unrouted rows go to the global index, the rest to their shards."""
+		out = [None] * len(routes)
+		glob = [j for j, r in enumerate(routes) if r is None]
+		shard = [j for j, r in enumerate(routes) if r is not None]
+		if glob:
+			for j, h in zip(glob, self._vector_hits(Q[glob], k)):
+				out[j] = h
+		if shard:
+			for j, h in zip(shard, self.shards.search(Q[shard], [routes[j] for j in shard], k)):
+				out[j] = h
+		return out
+
+	def _multi(self, ranked_lists, k: int):
+		# fuse the variants' rankings; `score` is the best cosine any variant gave the doc
+		best = {}
+		for hits in ranked_lists:
+			for idx, score in hits:
+				best[idx] = max(score, best.get(idx, score))
+		fused = rrf_fuse([[idx for idx, _ in hits] for hits in ranked_lists], k=k)
 		results = []
-		for score, idx in zip(D[0].tolist(), I[0].tolist()):
-			if idx == -1:
+		for (idx, fused_score), m in zip(fused, self.fetch([i for i, _ in fused])):
+			if m is None:
 				continue
-			m = self.meta[idx]
-			m["score"] = float(score)
+			m = dict(m)
+			m["rrf_score"] = fused_score
+			m["score"] = best[idx]
 			results.append(m)
-		return results
\ No newline at end of file
+		return results
+
+	def _vector_hits(self, Q: np.ndarray, k: int):
+		D, I = self.index.search(np.ascontiguousarray(Q, dtype=np.float32), k)
+		return [[(idx, score) for score, idx in zip(d, i) if idx != -1] for d, i in zip(D.tolist(), I.tolist())]
+
+	def _bm25_hits(self, query: str, k: int, allowed=None):
+		# allowed: sorted ids of the routed shards, or None for every document
+		scores, ids = self.bm25.search(query, k=k, within=allowed)
+		return scores.tolist(), ids.tolist()
+
+	def _hybrid(self, query: str, vec_hits, k: int, allowed=None):
+		vec = dict(vec_hits)
+		b_scores, b_ids = self._bm25_hits(query, max(k * 4, 20), allowed)
+		kw = dict(zip(b_ids, b_scores))
+		fused = rrf_fuse([list(vec), list(kw)], k=k)
+		results = []
+		for (idx, fused_score), m in zip(fused, self.fetch([i for i, _ in fused])):
+			if m is None:
+				continue
+			m = dict(m)
+			m["rrf_score"] = fused_score
+			if idx in vec:
+				m["score"] = vec[idx]
+			if idx in kw:
+				m["bm25_score"] = kw[idx]
+			results.append(m)
+		return results
+
+	def _records(self, scores, ids, field):
+		out = []
+		for score, m in zip(scores, self.fetch(ids)):
+			if m is None:
+				continue
+			m = dict(m)
+			m[field] = float(score)
+			out.append(m)
+		return out
+
+	def fetch(self, ids):
+		if isinstance(self.meta, MetaStore):
+			return self.meta.get_many(ids)
+		return [self.meta[i] if 0 <= i < len(self.meta) else None for i in ids]
\ No newline at end of file
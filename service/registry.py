@@ -0,0 +1,159 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+"""
+Process-wide registry of local seq2seq models for the huggingface provider.
+Each base model is loaded once and kept warm; LoRA adapters are attached to the
+shared base and selected per request. Models are evicted LRU when the total
+parameter memory exceeds the configured budget.
+"""
+
+
+
+
+class UnknownAdapter(ValueError):
+	"""The request named a LoRA adapter that isn't loaded: a client error, not a server one."""
+
+
+
+
+def _model_nbytes(model):
+	n = sum(p.numel() * p.element_size() for p in model.parameters())
+	n += sum(b.numel() * b.element_size() for b in model.buffers())
+	return n
+
+
+
+
+def _adapter_base(path):
+	cfg_path = os.path.join(path, "adapter_config.json")
+	if not os.path.exists(cfg_path):
+		return None
+	with open(cfg_path, "r", encoding="utf-8") as f:
+		return json.load(f).get("base_model_name_or_path")
+
+
+
+
+class LoadedModel:
+	def __init__(self, path, tokenizer, model, adapters, default_adapter):
+		self.path = path
+		self.tokenizer = tokenizer
+		self.model = model
+		self.adapters = adapters
+		self.default_adapter = default_adapter
+		self.nbytes = _model_nbytes(model)
+		# generate() mutates the active adapter, so a model is used by one caller at a time
+		self.lock = threading.Lock()
+
+	@contextmanager
+	def activated(self, adapter=None):
+		adapter = adapter or self.default_adapter
+		if adapter is not None and adapter not in self.adapters:
+			raise UnknownAdapter(f"Unknown LoRA adapter: {adapter}")
+		with self.lock:
+			if adapter is not None:
+				self.model.set_adapter(adapter)
+				yield self.model
+			elif self.adapters:
+				with self.model.disable_adapter():
+					yield self.model
+			else:
+				yield self.model
+
+
+
+
+class ModelRegistry:
+	def __init__(self, max_memory_mb: int = 0):
+		self.max_bytes = int(max_memory_mb) * 1024 * 1024
+		self._models = OrderedDict()
+		self._lock = threading.Lock()
+		self._loading = {}
+		self.loads = 0
+		self.evictions = 0
+
+	def get(self, path: str, adapters: dict = None) -> LoadedModel:
+		adapters = adapters or {}
+		while True:
+			with self._lock:
+				if path in self._models:
+					self._models.move_to_end(path)
+					return self._models[path]
+				ev = self._loading.get(path)
+				if ev is None:
+					ev = self._loading[path] = threading.Event()
+					break
+			# another thread is loading the same model; wait and retry the lookup
+			ev.wait()
+
+		try:
+			loaded = self._load(path, adapters)
+			with self._lock:
+				self._models[path] = loaded
+				self.loads += 1
+				self._evict(keep=path)
+			return loaded
+		finally:
+			with self._lock:
+				self._loading.pop(path, None)
+			ev.set()
+
+	def evict(self, path: str):
+		with self._lock:
+			if self._models.pop(path, None) is not None:
+				self.evictions += 1
+
+	def memory_bytes(self) -> int:
+		return sum(m.nbytes for m in self._models.values())
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"models": {p: {"bytes": m.nbytes, "adapters": sorted(m.adapters)} for p, m in self._models.items()},
+				"memory_bytes": self.memory_bytes(),
+				"max_bytes": self.max_bytes,
+				"loads": self.loads,
+				"evictions": self.evictions,
+			}
+
+	def _evict(self, keep):
+		if not self.max_bytes:
+			return
+		while self.memory_bytes() > self.max_bytes and len(self._models) > 1:
+			path = next(iter(self._models))
+			if path == keep:
+				break
+			self._models.pop(path)
+			self.evictions += 1
+
+	def _load(self, path, adapters):
+		from transformers import T5ForConditionalGeneration, T5TokenizerFast
+
+		base_path = _adapter_base(path)
+		if base_path is None:
+			base_path = path
+			default_adapter = None
+		else:
+			# path is a LoRA output dir: its adapter becomes the default
+			adapters = {"default": path, **adapters}
+			default_adapter = "default"
+
+		try:
+			tok = T5TokenizerFast.from_pretrained(path)
+		except OSError:
+			tok = T5TokenizerFast.from_pretrained(base_path)
+		mdl = T5ForConditionalGeneration.from_pretrained(base_path)
+
+		if adapters:
+			from peft import PeftModel
+			names = list(adapters)
+			mdl = PeftModel.from_pretrained(mdl, adapters[names[0]], adapter_name=names[0])
+			for name in names[1:]:
+				mdl.load_adapter(adapters[name], adapter_name=name)
+		mdl.eval()
+		return LoadedModel(path, tok, mdl, set(adapters), default_adapter)
\ No newline at end of file
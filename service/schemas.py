@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Literal
 
 
 class EnhanceRequest(BaseModel):
@@ -8,9 +8,44 @@ class EnhanceRequest(BaseModel):
 	issue_key: Optional[str] = None
 	update_jira: bool = False
 	top_k: int = 5
+	adapter: Optional[str] = None  # LoRA adapter name (huggingface provider only)
+	use_cache: bool = True
+	# vector (FAISS), bm25 (keyword), hybrid or multi_query; defaults to [retrieval] mode
+	retrieval_mode: Optional[Literal["vector", "bm25", "hybrid", "multi_query"]] = None
+	# projects whose tickets are retrieved as context; defaults to [project_key]
+	search_projects: Optional[List[str]] = None
+	include_timings: bool = False  # return a per-stage latency breakdown
 
 
 class EnhanceResponse(BaseModel):
 	enhanced: str
 	context: List[dict]
-	updated_issue_key: Optional[str] = None
\ No newline at end of file
+	updated_issue_key: Optional[str] = None  # issue queued for a background Jira update
+	cached: bool = False
+	timings: Optional[Dict[str, float]] = None  # ms per stage, if include_timings was set
+	priority: Optional[dict] = None  # predicted priority, severity and confidence, if a model is configured
+
+
+class BatchEnhanceRequest(BaseModel):
+	items: List[EnhanceRequest]
+	concurrency: int = Field(4, ge=1, le=64)  # max LLM calls in flight
+
+
+class ReloadRequest(BaseModel):
+	version: Optional[str] = None
+	force: bool = False  # reload even if `version` is already live
+
+
+class DuplicatesRequest(BaseModel):
+	issue_key: Optional[str] = None  # an indexed ticket: answered from the precomputed clusters
+	text: Optional[str] = None  # a new ticket's summary / description: one vector search
+	search_projects: Optional[List[str]] = None  # projects to search for `text`; default all
+	threshold: Optional[float] = None  # cosine cut-off for `text`; default from the clusters or [duplicates]
+	top_k: int = Field(10, ge=1, le=100)
+
+
+class DuplicatesResponse(BaseModel):
+	source: Literal["index", "search"]
+	threshold: float
+	duplicates: List[dict]  # ticket metadata + score and cluster (number, or None)
+	clusters: Dict[str, List[str]] = {}  # keys of every cluster a duplicate belongs to
@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import faiss
+
+from .storage import read_index
+
+
+"""
+Per-project (optionally per-component) FAISS shards next to the global index.
+
+  shards/manifest.json   {"by": "project", "shards": {name: {"file", "project", "count"}}}
+  shards/<file>.faiss    IndexIDMap2 over the same vector ids as the global index
+
+Shard names are the project key ("APP") or project/component ("APP/Billing").
+A query is routed to every shard of its project(s), each shard is searched on
+its own thread and the hits are merged by score. Routes that cover fewer than
+min_shard_size documents fall back to the global index.
+
+The search threads live in one process-wide pool per thread count, shared by
+every ShardSet, so an index reload doesn't leave the old set's threads behind.
+"""
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+
+
+def project_of(meta) -> str:
+	if meta.get("project"):
+		return meta["project"]
+	key = meta.get("key") or ""
+	return key.split("-", 1)[0] if "-" in key else ""
+
+
+
+
+def shard_names(meta, by: str):
+	project = project_of(meta)
+	if not project:
+		return []
+	if by == "component":
+		comps = [c for c in (meta.get("components") or []) if c]
+		# tickets without a component still belong to their project
+		return [f"{project}/{c}" for c in comps] or [f"{project}/-"]
+	return [project]
+
+
+
+
+def search_pool(threads: int) -> ThreadPoolExecutor:
+	threads = max(1, int(threads))
+	with _pools_lock:
+		if threads not in _pools:
+			_pools[threads] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="shard-search")
+		return _pools[threads]
+
+
+
+
+def _file_name(i: int, name: str) -> str:
+	return f"{i:04d}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)[:60]}.faiss"
+
+
+
+
+def build_shards(path: str, embs, metas, by: str, make_index):
+	"""
+	metas: iterable of (vector_id, meta) for live documents. `make_index(embs)`
+	returns an empty (trained) index for one shard's vectors.
+	"""
+	members = {}
+	for vid, meta in metas:
+		for name in shard_names(meta, by):
+			members.setdefault(name, []).append(int(vid))
+
+	tmp = path.rstrip("/\\") + ".tmp"
+	shutil.rmtree(tmp, ignore_errors=True)
+	os.makedirs(tmp)
+	manifest = {"by": by, "shards": {}}
+	for i, name in enumerate(sorted(members)):
+		ids = np.asarray(sorted(members[name]), dtype=np.int64)
+		vecs = np.ascontiguousarray(embs[ids], dtype=np.float32)
+		index = make_index(vecs)
+		index.add_with_ids(vecs, ids)
+		fname = _file_name(i, name)
+		faiss.write_index(index, os.path.join(tmp, fname))
+		manifest["shards"][name] = {"file": fname, "project": name.split("/", 1)[0], "count": len(ids)}
+	with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+		json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+	# same swap as BM25Index.save: readers holding the old shards keep working
+	old = path.rstrip("/\\") + ".old"
+	shutil.rmtree(old, ignore_errors=True)
+	if os.path.exists(path):
+		os.rename(path, old)
+	os.rename(tmp, path)
+	shutil.rmtree(old, ignore_errors=True)
+	return manifest
+
+
+
+
+class ShardSet:
+	def __init__(self, path: str, tune=None, min_shard_size: int = 50, threads: int = 4, mmap: bool = False):
+		with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+			manifest = json.load(f)
+		self.by = manifest.get("by", "project")
+		self.counts = {}
+		self.indexes = {}
+		self.by_project = {}
+		for name, info in manifest["shards"].items():
+			index = read_index(os.path.join(path, info["file"]), mmap)
+			if tune is not None:
+				tune(index)
+			self.indexes[name] = index
+			self.counts[name] = int(info["count"])
+			self.by_project.setdefault(info["project"], []).append(name)
+		self.min_shard_size = int(min_shard_size)
+		self._members = {}
+		self.pool = search_pool(threads)
+
+	@staticmethod
+	def exists(path: str) -> bool:
+		return os.path.exists(os.path.join(path, "manifest.json"))
+
+	def route(self, projects):
+		"""Shard names to search for these projects, or None for the global index."""
+		if not projects:
+			return None
+		names = tuple(n for p in dict.fromkeys(projects) for n in self.by_project.get(p, ()))
+		if not names or sum(self.counts[n] for n in names) < self.min_shard_size:
+			return None
+		return names
+
+	def members(self, names) -> np.ndarray:
+		"""Vector ids in these shards (a route), for restricting the global BM25 index to it."""
+		key = tuple(sorted(names))
+		if key not in self._members:
+			ids = [faiss.vector_to_array(self.indexes[n].id_map) for n in key]
+			self._members[key] = np.unique(np.concatenate(ids)).astype(np.int64)
+		return self._members[key]
+
+	def search(self, Q: np.ndarray, routes, k: int):
+		"""
+		Q: one row per query, routes: shard names per row. Each shard is searched
+		once with all the rows routed to it; shards run in parallel. Returns per-row
+		[(id, score)] best first, an id found in several shards counted once.
+		"""
+		rows_by_shard = {}
+		for row, names in enumerate(routes):
+			for name in names:
+				rows_by_shard.setdefault(name, []).append(row)
+
+		def one(name):
+			rows = rows_by_shard[name]
+			D, I = self.indexes[name].search(np.ascontiguousarray(Q[rows], dtype=np.float32), k)
+			return rows, D, I
+
+		merged = [{} for _ in routes]
+		for rows, D, I in self.pool.map(one, list(rows_by_shard)):
+			for row, d, i in zip(rows, D.tolist(), I.tolist()):
+				best = merged[row]
+				for score, idx in zip(d, i):
+					if idx != -1 and score > best.get(idx, -np.inf):
+						best[idx] = score
+		return [sorted(m.items(), key=lambda x: -x[1])[:k] for m in merged]
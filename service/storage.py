@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import faiss
+
+
+"""
+Storage footprint of the vector files.
+
+  embeddings.npy   float32, or float16 with [index] emb_dtype = "float16" (half the
+                   disk and page cache); always opened with mmap_mode="r" and cast
+                   to float32 one block at a time by whoever reads it
+  faiss_index.bin  flat / ivf_flat / hnsw keep a float32 copy of every vector;
+                   sq_fp16, sq8 and ivf_sq8 store 2 or 1 bytes per dimension
+
+read_index(path, mmap=True) maps the index file instead of copying it into RAM:
+IVF inverted lists via IO_FLAG_MMAP, the code arrays of flat, SQ and HNSW
+storage via IO_FLAG_MMAP_IFC (FAISS builds without that flag load normally).
+Mapped pages live in the OS page cache, so uvicorn workers share one copy and
+a reload doesn't double resident memory.
+"""
+
+
+EMB_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+
+
+def read_index(path: str, mmap: bool = False):
+	if not mmap:
+		return faiss.read_index(path)
+	with open(path, "rb") as f:
+		fourcc = f.read(4)
+	# IVF files start with "Iw.."; everything else we build is wrapped in IndexIDMap2
+	flag = faiss.IO_FLAG_MMAP if fourcc.startswith(b"Iw") else getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+	return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY) if flag else faiss.read_index(path)
+
+
+
+
+def emb_dtype(params: dict):
+	name = params.get("emb_dtype", "float32")
+	if name not in EMB_DTYPES:
+		raise SystemExit(f"Unknown emb_dtype: {name} (float32 or float16)")
+	return EMB_DTYPES[name]
+
+
+
+
+def file_mb(path: str) -> float:
+	return os.path.getsize(path) / (1024.0 * 1024.0) if os.path.exists(path) else 0.0
+
+
+
+
+def index_mb(index) -> float:
+	# serialized size, which is what a fully loaded (non-mmap) index keeps in RAM
+	return faiss.serialize_index(index).nbytes / (1024.0 * 1024.0)
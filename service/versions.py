@@ -0,0 +1,210 @@
+import os
+import copy
+import time
+import shutil
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+
+from .rag import Retriever
+
+
+"""
+Versioned index directories with an atomic "current" pointer.
+
+  index/versions/<version>/   faiss_index.bin, embeddings.npy, meta.jsonl + meta.idx, bm25/, shards/,
+                              duplicates.json (scripts/find_duplicates.py)
+  index/CURRENT               name of the live version (replaced with os.replace)
+
+scripts/build_index.py --publish writes a new version directory and flips
+CURRENT last. IndexManager notices the change, loads the new Retriever in a
+background thread and swaps the reference; in-flight searches finish on the
+Retriever they started with. Without a CURRENT file the flat paths from
+[index] are used, as before.
+"""
+
+
+log = logging.getLogger(__name__)
+
+FILES = {
+	"faiss_path": "faiss_index.bin", "emb_path": "embeddings.npy", "meta_path": "meta.jsonl", "bm25_path": "bm25",
+	"shards_path": "shards", "duplicates_path": "duplicates.json",
+}
+
+
+
+
+def new_version() -> str:
+	return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+
+
+def version_dir(root: str, version: str) -> str:
+	return os.path.join(root, "versions", version)
+
+
+
+
+def list_versions(root: str):
+	vdir = os.path.join(root, "versions")
+	if not os.path.isdir(vdir):
+		return []
+	return sorted(v for v in os.listdir(vdir) if not v.endswith(".tmp") and os.path.isdir(os.path.join(vdir, v)))
+
+
+
+
+def current_version(root: str):
+	try:
+		with open(os.path.join(root, "CURRENT"), "r", encoding="utf-8") as f:
+			return f.read().strip() or None
+	except FileNotFoundError:
+		return None
+
+
+
+
+def check_version(root: str, version: str):
+	# only names list_versions() reports: never a path that escapes <root>/versions
+	if version not in list_versions(root):
+		raise ValueError(f"Unknown index version: {version}")
+	if not os.path.exists(os.path.join(version_dir(root, version), FILES["faiss_path"])):
+		raise ValueError(f"Index version {version} has no {FILES['faiss_path']}")
+
+
+
+
+def set_current(root: str, version: str):
+	check_version(root, version)
+	tmp = os.path.join(root, "CURRENT.tmp")
+	with open(tmp, "w", encoding="utf-8") as f:
+		f.write(version + "\n")
+	os.replace(tmp, os.path.join(root, "CURRENT"))
+
+
+
+
+def prune_versions(root: str, keep: int):
+	# never removes the live version
+	live = current_version(root)
+	old = [v for v in list_versions(root) if v != live]
+	for v in old[:max(0, len(old) - keep + 1)]:
+		shutil.rmtree(version_dir(root, v), ignore_errors=True)
+
+
+
+
+def versioned_config(cfg: dict, version: str = None) -> dict:
+	"""cfg with [index] paths pointed at `version` (or the current one), if versions are in use."""
+	root = cfg["index"].get("root", "index")
+	version = version or current_version(root)
+	if version is None:
+		return cfg
+	out = copy.deepcopy(cfg)
+	base = version_dir(root, version)
+	for key, name in FILES.items():
+		out["index"][key] = os.path.join(base, name)
+	return out
+
+
+
+
+class IndexManager:
+	"""Owns the live Retriever and swaps in new index versions without a restart."""
+
+	def __init__(self, cfg: dict):
+		self.cfg = cfg
+		self.root = cfg["index"].get("root", "index")
+		self.interval = float(cfg["index"].get("reload_interval", 30))
+		self.version = current_version(self.root)
+		self.previous = None
+		self.retriever = Retriever(versioned_config(cfg, self.version))
+		self.loaded_at = time.time()
+		self.last_error = None
+		self._failed = None
+		self._lock = threading.Lock()
+		self._task = None
+
+	def load(self, version: str):
+		# reuse the query encoder: only the index files change between versions
+		return Retriever(versioned_config(self.cfg, version), encoder=self.retriever.encoder)
+
+	def reload(self, version: str = None, force: bool = False, pin: bool = False) -> bool:
+		"""
+		Load `version` (default: whatever CURRENT points at) and swap it in. Blocking;
+		call from a worker thread. Returns False if that version is already live,
+		unless `force` (re-read files added to the live version in place). `pin`
+		also points CURRENT at it, once it has loaded.
+		"""
+		with self._lock:
+			target = version or current_version(self.root)
+			if target is None:
+				raise ValueError("No CURRENT index version to load")
+			if target == self.version and not force:
+				if pin:
+					set_current(self.root, target)
+				return False
+			try:
+				check_version(self.root, target)
+				fresh = self.load(target)
+				if fresh.index is None:
+					raise ValueError(f"Index version {target} did not load a FAISS index")
+			except Exception as e:
+				self.last_error = f"{target}: {e}"
+				self._failed = target
+				raise
+			if pin:
+				# the watcher re-reads CURRENT under this lock, so it sees the pin and stays put
+				set_current(self.root, target)
+			if target != self.version:
+				# a forced reload of the live version (e.g. new duplicates.json) keeps the rollback target
+				self.previous, self.version = self.version, target
+			self.retriever = fresh
+			self.loaded_at = time.time()
+			self.last_error = None
+			log.info("Index version %s is live (was %s)", target, self.previous)
+			return True
+
+	def activate(self, version: str, force: bool = False) -> bool:
+		# pin CURRENT as well, so the watcher doesn't switch straight back; a version
+		# that fails to load leaves CURRENT and the live index as they were
+		return self.reload(version, force, pin=True)
+
+	def rollback(self) -> bool:
+		if self.previous is None:
+			raise ValueError("No previous index version to roll back to")
+		return self.activate(self.previous)
+
+	def status(self) -> dict:
+		return {
+			"version": self.version,
+			"current_pointer": current_version(self.root),
+			"previous": self.previous,
+			"loaded_at": self.loaded_at,
+			"available": list_versions(self.root),
+			"documents": self.retriever.index.ntotal if self.retriever.index is not None else 0,
+			"watch_interval": self.interval,
+			"last_error": self.last_error,
+		}
+
+	async def watch(self):
+		while True:
+			await asyncio.sleep(self.interval)
+			# a version that failed to load is retried only through the admin endpoint
+			if current_version(self.root) in (None, self.version, self._failed):
+				continue
+			try:
+				await asyncio.to_thread(self.reload)
+			except Exception:
+				log.exception("Index reload failed; keeping version %s", self.version)
+
+	def start(self):
+		if self.interval > 0 and self._task is None:
+			self._task = asyncio.get_running_loop().create_task(self.watch())
+
+	async def stop(self):
+		if self._task is not None:
+			self._task.cancel()
+			self._task = None
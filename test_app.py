@@ -4,6 +4,9 @@ import json
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from service.bm25 import BM25Index
+from service.priority import PriorityModel, keyword_priority, severity_of
+
 # -------------------
 # CONFIG
 # -------------------
@@ -11,6 +14,7 @@ BUGS_FILE = "data/dummy_bugs.jsonl"   # your bug dataset
 MODEL_NAME = "all-MiniLM-L6-v2"       # same model used during indexing
 FAISS_DIM = 384                       # embedding dimension
 TOP_K = 10                            # number of results to retrieve
+PRIORITY_PATH = "models/priority.npz" # built by scripts/train_priority.py
 
 # -------------------
 # Load dataset
@@ -25,12 +29,14 @@ with open(BUGS_FILE, "r", encoding="utf-8") as f:
 # -------------------
 print("📥 Loading model & building FAISS index...")
 model = SentenceTransformer(MODEL_NAME)
+priority_model = PriorityModel.load(PRIORITY_PATH) if PriorityModel.exists(PRIORITY_PATH) else None
 
 bug_texts = [f"{b['summary']} - {b['description']} ({b['platform']})" for b in bugs]
 embeddings = model.encode(bug_texts, convert_to_numpy=True)
 
 index = faiss.IndexFlatL2(FAISS_DIM)
 index.add(embeddings)
+keyword_index = BM25Index.build((i, f"{b['summary']}\n\n{b['description']}") for i, b in enumerate(bugs))
 print(f"✅ FAISS index built with {len(bugs)} bug reports")
 
 # -------------------
@@ -43,10 +49,9 @@ def search_bugs(query, k=TOP_K, keyword_match=True):
     results = [(bugs[idx], D[0][rank]) for rank, idx in enumerate(I[0])]
 
     if keyword_match:
-        keyword_hits = [
-            (bug, 0.0) for bug in bugs
-            if query.lower() in bug["summary"].lower() or query.lower() in bug["description"].lower()
-        ]
+        # BM25 inverted index instead of a substring scan over every bug
+        scores, ids = keyword_index.search(query, k=k)
+        keyword_hits = [(bugs[i], score) for score, i in zip(scores.tolist(), ids.tolist())]
         results_dict = {r[0]["summary"]: r for r in results}
         for bug, score in keyword_hits:
             results_dict[bug["summary"]] = (bug, score)
@@ -55,21 +60,17 @@ def search_bugs(query, k=TOP_K, keyword_match=True):
     return results
 
 # -------------------
-# Severity & Priority heuristics
+# Severity & Priority
 # -------------------
 def suggest_severity_priority(bug):
-    text = (bug["summary"] + " " + bug["description"]).lower()
-
-    if any(word in text for word in ["crash", "data loss", "corruption", "unresponsive", "failover"]):
-        return "Severity: Critical", "Priority: High"
-
-    if any(word in text for word in ["latency", "delay", "slow", "high cpu", "memory leak", "timeout"]):
-        return "Severity: Major", "Priority: Medium"
-
-    if any(word in text for word in ["ui", "format", "glitch", "display", "alignment"]):
-        return "Severity: Minor", "Priority: Low"
+    """Trained classifier (scripts/train_priority.py) if available, else the keyword heuristic."""
+    text = bug["summary"] + " " + bug["description"]
+    if priority_model is not None:
+        priority = priority_model.predict(model.encode([text], normalize_embeddings=True))[0]["priority"]
+    else:
+        priority = keyword_priority([text])[0]
+    return f"Severity: {severity_of(priority)}", f"Priority: {priority}"
 
-    return "Severity: Major", "Priority: Medium"  # default
 
 # -------------------
 # Interactive loop